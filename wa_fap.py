@@ -15,10 +15,45 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.ticker as mlocat
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import time
+import argparse
+import zlib
+import os
+import pickle
+import sqlite3
+import threading
+import random
+import re
+import shutil
+import tempfile
+import tracemalloc
+import json
+import sys
+import builtins
+import contextlib
+import warnings
+import bisect
+import functools
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from urllib.request import urlopen
+from urllib.error import HTTPError
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
+from rich.live import Live
+from yfinance.exceptions import YFRateLimitError
+from yfinance.data import YfData
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 
 
@@ -31,12 +66,591 @@ ROSE = "\033[95m"
 RESET = "\033[0m"
 
 # Autres paramètres
-delai = 0.5
 console = Console()
+ticker_factory = yf.Ticker                  # Constructeur des actifs (remplaçable par OfflineTicker hors ligne)
 
 
 
+# Instrumentation : compteurs et histogrammes de latence (appels à yahoo!finance, étapes du parcours), exportés en JSON ou au format Prometheus
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+telemetry_counters = {}                     # (nom, étiquettes) -> valeur cumulée
+telemetry_histograms = {}                   # (nom, étiquettes) -> [effectifs par borne (dernière : au-delà), somme, nombre]
+telemetry_lock = threading.Lock()
+TELEMETRY_HELP = {
+    "fap_stage_seconds": "Durée des étapes du parcours (secondes)",
+    "fap_stage_errors_total": "Étapes interrompues par une erreur",
+    "fap_upstream_seconds": "Durée des appels à yahoo!finance (secondes, hors attente du limiteur)",
+    "fap_upstream_requests_total": "Appels à yahoo!finance (tentatives)",
+    "fap_upstream_errors_total": "Appels à yahoo!finance en erreur",
+    "fap_upstream_bytes_total": "Taille approximative des réponses de yahoo!finance (octets)",
+    "fap_sleep_seconds_total": "Temps passé en attente volontaire (secondes)",
+    "fap_cache_requests_total": "Lectures du cache local",
+    "fap_cache_bytes_total": "Octets lus et écrits dans le cache local",
+    "fap_cache_evictions_total": "Entrées évincées du cache local",
+    "fap_history_lookups_total": "Demandes d'historique complet (mémoire ou chargement)",
+    "fap_coalesced_requests_total": "Chargements regroupés (meneur : chargement effectif ; suiveur : attente du meneur)",
+    "fap_fx_lookups_total": "Chargements de taux de change (une requête par paire manquante)",
+    "fap_fx_pairs_total": "Paires de taux de change demandées",
+    "fap_fx_errors_total": "Paires de taux de change en erreur",
+    "fap_warehouse_operations_total": "Opérations de l'entrepôt d'historiques",
+    "fap_http_seconds": "Durée des requêtes du service HTTP local (secondes)",
+    "fap_http_responses_total": "Réponses du service HTTP local",
+    "fap_http_bytes_total": "Octets envoyés par le service HTTP local",
+}
+
+
+# Ajouter "value" à un compteur
+def count(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with telemetry_lock:
+        telemetry_counters[key] = telemetry_counters.get(key, 0) + value
+
+
+# Ranger une durée dans son histogramme (bornes fixes : une recherche dichotomique et trois additions)
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(LATENCY_BUCKETS, value)
+    with telemetry_lock:
+        histogram = telemetry_histograms.get(key)
+        if histogram is None:
+            histogram = telemetry_histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+        histogram[0][index] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+# Mesurer chaque appel d'une étape du parcours (durée, erreurs), sous le nom de la fonction
+def instrumented(function):
+    stage = function.__name__
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            count("fap_stage_errors_total", stage=stage)
+            raise
+        finally:
+            observe("fap_stage_seconds", time.perf_counter() - start, stage=stage)
+    return wrapper
+
+
+# Estimer la taille d'une réponse de yahoo!finance (mémoire d'un DataFrame, sinon taille sérialisée)
+def payload_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+# Relever les compteurs déjà tenus par le cache, le regroupement, le change et l'entrepôt, sous forme de compteurs instrumentés
+def collected_counters():
+    counters = {}
+    for kind in ("info", "intraday", "daily"):
+        for result, label in (("hits", "hit"), ("misses", "miss")):
+            counters[("fap_cache_requests_total", (("kind", kind), ("result", label)))] = cache_stats[kind][result]
+    counters[("fap_cache_evictions_total", ())] = cache_stats["evictions"]
+    for role, label in (("leaders", "leader"), ("followers", "follower")):
+        counters[("fap_coalesced_requests_total", (("role", label),))] = inflight_stats[role]
+    counters[("fap_fx_lookups_total", ())] = fx_stats["lookups"]
+    counters[("fap_fx_pairs_total", ())] = fx_stats["pairs"]
+    counters[("fap_fx_errors_total", ())] = fx_stats["errors"]
+    for operation, value in warehouse_stats.items():
+        counters[("fap_warehouse_operations_total", (("operation", operation),))] = value
+    return counters
+
+
+# Copier l'état de l'instrumentation (compteurs relevés compris)
+def telemetry_state():
+    with telemetry_lock:
+        counters = dict(telemetry_counters)
+        histograms = {key: (list(buckets), total, number) for key, (buckets, total, number) in telemetry_histograms.items()}
+    counters.update(collected_counters())
+    return counters, histograms
+
+
+# Exporter l'instrumentation en dictionnaire JSON (effectifs cumulés par borne, comme Prometheus)
+def telemetry_snapshot():
+    counters, histograms = telemetry_state()
+    snapshot = {"generated_at": datetime.now().isoformat(timespec="seconds"), "counters": {}, "histograms": {}}
+    for (name, labels), value in sorted(counters.items()):
+        snapshot["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+    for (name, labels), (buckets, total, number) in sorted(histograms.items()):
+        cumulative = np.cumsum(buckets).tolist()
+        snapshot["histograms"].setdefault(name, []).append({
+            "labels": dict(labels), "count": number, "sum": total,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], cumulative))})
+    return snapshot
+
+
+# Exporter l'instrumentation au format texte de Prometheus
+def telemetry_prometheus():
+    counters, histograms = telemetry_state()
+    def labels_text(labels):
+        if not labels:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines += [f"# HELP {name} {TELEMETRY_HELP.get(name, name)}", f"# TYPE {name} counter"]
+        lines += [f"{name}{labels_text(labels)} {value}" for (key, labels), value in sorted(counters.items()) if key == name]
+    for name in sorted({name for name, _ in histograms}):
+        lines += [f"# HELP {name} {TELEMETRY_HELP.get(name, name)}", f"# TYPE {name} histogram"]
+        for (key, labels), (buckets, total, number) in sorted(histograms.items()):
+            if key != name:
+                continue
+            for bound, cumulative in zip([*map(str, LATENCY_BUCKETS), "+Inf"], np.cumsum(buckets).tolist()):
+                lines.append(f"{name}_bucket{labels_text((*labels, ('le', bound)))} {cumulative}")
+            lines += [f"{name}_sum{labels_text(labels)} {total}", f"{name}_count{labels_text(labels)} {number}"]
+    return "\n".join(lines) + "\n"
+
+
+# Écrire l'instrumentation dans un fichier ("-" : sortie standard), en JSON ou au format Prometheus (déduit de l'extension)
+def write_telemetry(path, telemetry_format=None):
+    telemetry_format = telemetry_format or ("json" if path.endswith(".json") else "prometheus")
+    text = json.dumps(telemetry_snapshot(), indent=2, ensure_ascii=False) if telemetry_format == "json" else telemetry_prometheus()
+    if path == "-":
+        print(text)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+
+# Limiteur de débit partagé : seau à jetons adaptatif, avec attente exponentielle et aléa sur les erreurs "Too Many Requests"
+rate_limit = {"rate": 2.0, "max_rate": 2.0, "min_rate": 0.1, "burst": 5, "max_retries": 5, "backoff": 1.0, "max_backoff": 60.0}
+limiter_state = {"tokens": rate_limit["burst"], "updated": time.monotonic()}
+limiter_stats = {"requests": 0, "throttled_time": 0.0, "retries": 0, "rate_limited": 0}
+limiter_lock = threading.Lock()
+
+
+
+# Attendre qu'un jeton soit disponible (débit courant, rafale permise jusqu'à "burst" requêtes)
+def acquire_token():
+    while True:
+        with limiter_lock:
+            now = time.monotonic()
+            tokens = limiter_state["tokens"] + (now - limiter_state["updated"]) * rate_limit["rate"]
+            limiter_state["tokens"], limiter_state["updated"] = min(rate_limit["burst"], tokens), now
+            if limiter_state["tokens"] >= 1:
+                limiter_state["tokens"] -= 1
+                limiter_stats["requests"] += 1
+                return
+            wait = (1 - limiter_state["tokens"]) / rate_limit["rate"]
+            limiter_stats["throttled_time"] += wait
+        count("fap_sleep_seconds_total", wait, reason="throttle")
+        time.sleep(wait)
+
+
+# Reconnaître une erreur de limitation de débit de yahoo!finance : exception dédiée ou réponse HTTP 429 (pas une recherche dans le message)
+def is_rate_limited(error):
+    return isinstance(error, YFRateLimitError) or getattr(getattr(error, "response", None), "status_code", None) == 429
+
+
+# Exécuter une requête yahoo!finance sous le limiteur : ralentir de moitié sur limitation, puis réaccélérer progressivement
+def call_upstream(function, *args, endpoint=None, **kwargs):
+    endpoint = endpoint or getattr(function, "__name__", "call")
+    for attempt in range(rate_limit["max_retries"] + 1):
+        acquire_token()
+        count("fap_upstream_requests_total", endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            observe("fap_upstream_seconds", time.perf_counter() - start, endpoint=endpoint)
+            count("fap_upstream_errors_total", endpoint=endpoint, error="rate_limited" if is_rate_limited(e) else type(e).__name__)
+            if not is_rate_limited(e) or attempt == rate_limit["max_retries"]:
+                raise
+            backoff = random.uniform(0, min(rate_limit["max_backoff"], rate_limit["backoff"] * 2 ** attempt))
+            with limiter_lock:
+                rate_limit["rate"] = max(rate_limit["min_rate"], rate_limit["rate"] / 2)
+                limiter_state["tokens"] = 0
+                limiter_stats["retries"] += 1
+                limiter_stats["rate_limited"] += 1
+                limiter_stats["throttled_time"] += backoff
+            count("fap_sleep_seconds_total", backoff, reason="backoff")
+            time.sleep(backoff)
+            continue
+        observe("fap_upstream_seconds", time.perf_counter() - start, endpoint=endpoint)
+        count("fap_upstream_bytes_total", payload_size(result), endpoint=endpoint)
+        with limiter_lock:
+            rate_limit["rate"] = min(rate_limit["max_rate"], rate_limit["rate"] + rate_limit["max_rate"] / 20)
+        return result
+
+
+# Résumer l'activité du limiteur de débit
+def limiter_summary():
+    return (f"Débit : {limiter_stats['requests']} requêtes, {limiter_stats['throttled_time']:.2f} s d'attente cumulée, "
+            f"{limiter_stats['retries']} reprises sur limitation ({rate_limit['rate']:.2f} requêtes/s)")
+
+
+
+# Télécharger l'historique de plusieurs tickers via le pool de travail : une requête, et donc un jeton du limiteur, par ticker
+def fetch_histories(symbols, workers=8, **kwargs):
+    histories, errors = {}, {}
+    if not symbols:
+        return histories, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(symbols)))) as pool:
+        futures = {pool.submit(call_upstream, ticker_factory(symbol).history, **kwargs): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            try:
+                histories[futures[future]] = future.result()
+            except Exception as e:
+                errors[futures[future]] = e
+    return histories, errors
+
+
+
+# Regroupement des requêtes simultanées : un seul chargement en cours par clé, les autres fils en attendent le résultat
+inflight = {}
+inflight_lock = threading.Lock()
+inflight_stats = {"leaders": 0, "followers": 0}
+coalescing_enabled = True
+
+
+
+# Exécuter "function" une seule fois pour toutes les demandes simultanées d'une même clé
+def single_flight(key, function, *args, **kwargs):
+    if not coalescing_enabled:
+        return function(*args, **kwargs)
+    with inflight_lock:
+        future = inflight.get(key)
+        leader = future is None
+        if leader:
+            future = inflight[key] = Future()
+        inflight_stats["leaders" if leader else "followers"] += 1
+    if not leader:
+        return future.result()
+    try:
+        result = function(*args, **kwargs)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with inflight_lock:
+            inflight.pop(key, None)
+
+
+
+# Cache local sur disque (SQLite) des données yahoo!finance
+cache_dir = os.environ.get("FAP_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "wa_fap"))
+cache_enabled = True
+cache_budget = 256 * 1024 ** 2              # Budget disque du cache (octets), au-delà : éviction LRU
+cache_ttl = {"info": 6 * 3600, "intraday": 5 * 60}      # Durées de vie (s) ; barres journalières : jusqu'à la prochaine clôture
+cache_stats = {kind: {"hits": 0, "misses": 0} for kind in ("info", "intraday", "daily")}
+cache_stats["evictions"] = 0
+cache_lock = threading.Lock()
+cache_db = None
+INTRADAY = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+
+
+
+# Ouvrir (une seule fois) la base SQLite du cache
+def cache_connection():
+    global cache_db
+    if cache_db is None:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_db = sqlite3.connect(os.path.join(cache_dir, "cache.sqlite"), check_same_thread=False, isolation_level=None)
+        cache_db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, kind TEXT, value BLOB, "
+                         "size INTEGER, expires_at REAL, last_access REAL)")
+    return cache_db
+
+
+# Lire une entrée valide du cache (None si absente ou expirée) et compter le succès/l'échec
+def cache_get(key, kind):
+    if not cache_enabled:
+        return None
+    now = time.time()
+    with cache_lock:
+        try:
+            db = cache_connection()
+            row = db.execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row is not None:
+                db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                count("fap_cache_bytes_total", len(row[0]), direction="read")
+        except sqlite3.Error:
+            row = None
+        cache_stats[kind]["hits" if row is not None else "misses"] += 1
+    return pickle.loads(row[0]) if row is not None else None
+
+
+# Écrire une entrée dans le cache, puis évincer les entrées expirées et les moins récemment lues au-delà du budget
+def cache_put(key, kind, value, expires_at):
+    if not cache_enabled:
+        return
+    blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    now = time.time()
+    with cache_lock:
+        try:
+            db = cache_connection()
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", (key, kind, blob, len(blob), expires_at, now))
+            count("fap_cache_bytes_total", len(blob), direction="write")
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > cache_budget:
+                for old_key, size in db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                    if total <= cache_budget:
+                        break
+                    db.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                    total -= size
+                    cache_stats["evictions"] += 1
+        except sqlite3.Error:
+            pass
+
+
+# Vider le cache et retourner le nombre d'entrées et la taille occupée avant l'opération
+def cache_clear():
+    with cache_lock:
+        db = cache_connection()
+        entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        db.execute("DELETE FROM entries")
+        db.execute("VACUUM")
+    return entries, size
+
+
+# Déterminer l'instant (epoch) de la prochaine clôture de marché après "since" (défaut : maintenant), 16h30 heure de la place, hors week-end
+def next_close(timezone_name=None, since=None):
+    since = time.time() if since is None else since
+    try:
+        now = pd.Timestamp(since, unit="s", tz="UTC").tz_convert(timezone_name or "America/New_York")
+    except Exception:
+        now = pd.Timestamp(since, unit="s", tz="UTC").tz_convert("America/New_York")
+    close = now.normalize() + pd.Timedelta(hours=16, minutes=30)
+    while close <= now or close.weekday() >= 5:
+        close += pd.Timedelta(days=1)
+    return close.timestamp()
+
+
+# Accéder aux informations (info) d'un actif via le cache, sinon via yahoo!finance
+def cached_info(ticker):
+    key = f"info:{ticker.ticker}"
+    def load():
+        info = cache_get(key, "info")
+        if info is None:
+            info = call_upstream(lambda: ticker.info, endpoint="info")
+            if 'shortName' in info:
+                cache_put(key, "info", info, time.time() + cache_ttl["info"])
+        return info
+    return single_flight(key, load)
+
+
+# Accéder à l'historique de prix d'un actif via le cache, sinon via yahoo!finance
+def cached_history(ticker, timezone_name=None, **kwargs):
+    kind = "intraday" if kwargs.get("interval") in INTRADAY or kwargs.get("period") == "1d" else "daily"
+    key = f"history:{ticker.ticker}:{sorted(kwargs.items())}"
+    history = cache_get(key, kind)
+    if history is None:
+        history = call_upstream(ticker.history, **kwargs)
+        if not history.empty:
+            expires_at = time.time() + cache_ttl["intraday"] if kind == "intraday" else next_close(timezone_name)
+            cache_put(key, kind, history, expires_at)
+    return history
+
+
+# Résumer les succès/échecs du cache (les échecs correspondent aux requêtes réseau)
+def cache_summary():
+    hits = sum(cache_stats[kind]["hits"] for kind in ("info", "intraday", "daily"))
+    misses = sum(cache_stats[kind]["misses"] for kind in ("info", "intraday", "daily"))
+    details = ", ".join(f"{kind} {cache_stats[kind]['hits']}/{cache_stats[kind]['hits'] + cache_stats[kind]['misses']}"
+                        for kind in ("info", "intraday", "daily"))
+    return f"Cache : {hits} succès, {misses} requêtes réseau, {cache_stats['evictions']} évictions ({details})"
+
+
+
+# Historique de prix par actif : téléchargé une seule fois (intrajournalier et journalier), puis découpé localement par période
+history_store = OrderedDict()               # (ticker, nature) -> (historique complet, expiration), du moins récemment utilisé au plus récent
+history_store_size = 64                     # Nombre maximal d'historiques conservés en mémoire
+history_lock = threading.Lock()
+HISTORY_RANGES = {"intraday": {"period": "5d", "interval": "30m"}, "daily": {"period": "max", "interval": "1d"}}
+PERIOD_DAYS = {"1d": 1, "3d": 3, "5d": 5}
+PERIOD_OFFSETS = {"1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+                  "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+                  "10y": pd.DateOffset(years=10)}
+
+
+
+# Obtenir l'historique complet d'un actif (nature "intraday" : 5 jours en barres de 30 minutes ; "daily" : tout l'historique journalier)
+def asset_history(ticker, kind, timezone_name=None):
+    key = (ticker.ticker, kind)
+    def load():
+        with history_lock:
+            if key in history_store and time.time() < history_store[key][1]:
+                history_store.move_to_end(key)
+                count("fap_history_lookups_total", kind=kind, source="memory")
+                return history_store[key][0]
+        count("fap_history_lookups_total", kind=kind, source="load")
+        fetched_at = time.time()                # Même expiration que le cache local et l'entrepôt
+        expires_at = fetched_at + cache_ttl["intraday"] if kind == "intraday" else next_close(timezone_name, fetched_at)
+        if warehouse_enabled and cache_enabled:
+            history = warehouse_history(ticker, kind, timezone_name)
+        else:
+            history = cached_history(ticker, timezone_name, **HISTORY_RANGES[kind])
+        with history_lock:
+            history_store[key] = (history, expires_at)
+            history_store.move_to_end(key)
+            while len(history_store) > history_store_size:
+                history_store.popitem(last=False)
+        return history
+    return single_flight(("history", *key), load)
+
+
+# Découper localement l'historique d'un actif sur une période yahoo!finance (1d, 3d, 5d, 1mo ... 10y, max)
+def period_history(ticker, period, timezone_name=None):
+    if period in PERIOD_DAYS:
+        history = asset_history(ticker, "intraday", timezone_name)
+        if history.empty:                       # Pas de barres intrajournalières (ex. : fonds) : recours au journalier
+            history = asset_history(ticker, "daily", timezone_name)
+            return history.iloc[-PERIOD_DAYS[period]:]
+        days = history.index.normalize()
+        return history[days >= days.unique()[-PERIOD_DAYS[period]:][0]]
+    history = asset_history(ticker, "daily", timezone_name)
+    if period == "max" or history.empty:
+        return history
+    return history[history.index >= history.index[-1] - PERIOD_OFFSETS[period]]
+
+
+
+# Entrepôt local d'historiques : un fichier colonnaire Arrow par ticker et intervalle, complété par ajout des seules barres nouvelles
+warehouse_enabled = pa is not None          # Nécessite pyarrow (sinon : historiques via le cache local)
+warehouse_locks = {}
+warehouse_stats = {"reads": 0, "full_downloads": 0, "updates": 0, "bars_appended": 0}
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+INTRADAY_RETENTION = pd.Timedelta(days=30)  # Barres intrajournalières conservées (yahoo!finance n'en fournit que 60 jours)
+
+
+
+# Chemin du fichier d'un ticker et d'un intervalle dans l'entrepôt
+def warehouse_path(symbol, interval):
+    return os.path.join(cache_dir, "history", f"{re.sub(r'[^\w.=-]', '_', symbol)}_{interval}.arrow")
+
+
+# Lire un historique de l'entrepôt par projection mémoire, sans copie des colonnes (None si absent ou illisible)
+def read_warehouse(path):
+    if not os.path.exists(path):
+        return None, 0.0
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None, 0.0
+    warehouse_stats["reads"] += 1
+    fetched_at = float((table.schema.metadata or {}).get(b"fetched_at", 0))
+    return table.to_pandas(split_blocks=True).set_index("Date"), fetched_at
+
+
+# Écrire un historique dans l'entrepôt (fichier temporaire, puis remplacement atomique)
+def write_warehouse(path, history, fetched_at):
+    frame = history.reindex(columns=HISTORY_COLUMNS).astype("float64").rename_axis("Date").reset_index()
+    table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata({"fetched_at": str(fetched_at)})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    try:
+        os.replace(f"{path}.tmp", path)
+    except OSError:                             # Fichier encore projeté en mémoire (Windows) : mise à jour au prochain lancement
+        os.remove(f"{path}.tmp")
+
+
+# Obtenir l'historique d'un actif via l'entrepôt : lecture locale si à jour, sinon ajout des barres postérieures à la dernière conservée
+def warehouse_history(ticker, kind, timezone_name=None):
+    interval = HISTORY_RANGES[kind]["interval"]
+    path = warehouse_path(ticker.ticker, interval)
+    with history_lock:
+        lock = warehouse_locks.setdefault(path, threading.Lock())
+    with lock:
+        stored, fetched_at = read_warehouse(path)
+        expires_at = fetched_at + cache_ttl["intraday"] if kind == "intraday" else next_close(timezone_name, fetched_at)
+        if stored is not None and not stored.empty and time.time() < expires_at:
+            return stored
+
+        now = time.time()
+        history = None
+        if stored is not None and not stored.empty and (kind == "daily" or stored.index[-1] > pd.Timestamp.now(tz=stored.index.tz) - INTRADAY_RETENTION):
+            # Reprendre à l'avant-dernière barre conservée (complète, sert de témoin d'ajustement) ; la dernière, possiblement partielle, est remplacée
+            anchor = stored.index[-2] if len(stored) > 1 else stored.index[-1]
+            recent = call_upstream(ticker.history, start=anchor.strftime("%Y-%m-%d"), interval=interval)
+            if recent.empty:
+                history = stored
+            elif anchor not in recent.index or np.isclose(stored.at[anchor, "Close"], recent.at[anchor, "Close"], rtol=1e-3):
+                history = pd.concat([stored[stored.index < recent.index[0]], recent.reindex(columns=HISTORY_COLUMNS)])
+                warehouse_stats["updates"] += 1
+                warehouse_stats["bars_appended"] += int((recent.index > stored.index[-1]).sum())
+        if history is None:                     # Premier téléchargement, ou prix passés ajustés (dividende, fractionnement)
+            history = call_upstream(ticker.history, **HISTORY_RANGES[kind]).reindex(columns=HISTORY_COLUMNS)
+            warehouse_stats["full_downloads"] += 1
+        if kind == "intraday" and not history.empty:
+            history = history[history.index > history.index[-1] - INTRADAY_RETENTION]
+        if not history.empty:
+            write_warehouse(path, history, now)
+        return history
+
+
+# Résumer l'activité de l'entrepôt d'historiques
+def warehouse_summary():
+    return (f"Entrepôt : {warehouse_stats['reads']} lectures, {warehouse_stats['full_downloads']} téléchargements complets, "
+            f"{warehouse_stats['updates']} mises à jour ({warehouse_stats['bars_appended']} barres ajoutées)")
+
+
+# Mesurer la latence de l'entrepôt par ticker : téléchargement initial, lecture complète à chaud et mise à jour incrémentale
+def warehouse_benchmark(tickers, kind="daily"):
+    global cache_dir, cache_enabled
+    if not warehouse_enabled:
+        print(f"{RED}L'entrepôt d'historiques nécessite pyarrow (pip install pyarrow).{RESET}")
+        return None
+    saved = cache_dir, cache_enabled
+    cache_dir, cache_enabled = tempfile.mkdtemp(prefix="wa_fap_bench_"), False
+    timings = {"Téléchargement initial": [], "Lecture complète à chaud": [], "Mise à jour incrémentale": []}
+    peak = 0
+    try:
+        for input_ticker in tickers:
+            ticker = ticker_factory(input_ticker)
+            path = warehouse_path(ticker.ticker, HISTORY_RANGES[kind]["interval"])
+            for name in timings:
+                if name == "Mise à jour incrémentale":   # Retirer les 5 dernières barres et vieillir le fichier
+                    stored, _ = read_warehouse(path)
+                    write_warehouse(path, stored.iloc[:-5].copy(), 0.0)
+                start = time.perf_counter()
+                history = warehouse_history(ticker, kind)
+                timings[name].append(time.perf_counter() - start)
+                del history
+            tracemalloc.start()                 # Allocations d'une lecture à chaud (mesurées à part : le traçage ralentit)
+            history = warehouse_history(ticker, kind)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            del history
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cache_dir, cache_enabled = saved
+
+    table = Table(title=f"Entrepôt d'historiques ({len(tickers)} tickers, barres {HISTORY_RANGES[kind]['interval']})")
+    for column in ("Étape", "Moyenne (ms)", "Médiane (ms)", "Max (ms)"):
+        table.add_column(column)
+    for name, values in timings.items():
+        values = np.array(values) * 1000
+        table.add_row(name, f"{values.mean():.2f}", f"{np.median(values):.2f}", f"{values.max():.2f}")
+    console.print(table)
+    console.print(f"Pic d'allocations Python d'une lecture complète à chaud : {peak / 1024:.1f} Ko")
+    return timings
+
+
+
+# Charger l'actif financier sur yahoo!finance, sans interaction (LookupError si le ticker n'est pas reconnu)
+@instrumented
+def load_ticker(input_ticker):
+    ticker = ticker_factory(input_ticker)
+    info = cached_info(ticker)
+    if 'shortName' not in info:
+        raise LookupError(f"Le ticker n'a pas été reconnu. Veuillez vous assurer que {input_ticker} fait bien partie de yahoo!finance.")
+    return ticker, info
+
+
 # Accéder aux données de l'actif financier sur yahoo!finance via le ticker fourni
+@instrumented
 def get_ticker():
     while True:
         input_ticker = input("Ticker de l'actif financier ---> ").strip().upper()
@@ -45,36 +659,182 @@ def get_ticker():
             print("Aucun ticker n'a été inscrit. Veuillez réessayer.")
             continue
         try:
-            ticker = yf.Ticker(input_ticker)
-            info = ticker.info
-            time.sleep(delai)
-            if 'shortName' in info:
-                return input_ticker, ticker, info
-            else:
-                print(f"{RED}Le ticker n'a pas été reconnu. Veuillez vous assurer que {input_ticker} fait bien partie de yahoo!finance.{RESET}")
+            ticker, info = load_ticker(input_ticker)
+            return input_ticker, ticker, info
+        except LookupError as e:
+            print(f"{RED}{e}{RESET}")
         except Exception as e:
             print(f"{RED}Veuillez vérifier le ticker puis réessayer.{RESET}")
             print(f"{RED}Erreur lors de la correspondance dans yahoo!finance : {e}{RESET}")
 
 
+# Service de taux de change : matrice en mémoire des taux, chargés en lot, avec triangulation via USD puis EUR
+fx_matrix = {}                              # (monnaie, monnaie locale) -> {"rate", "quoted_at", "fetched_at", "stale"}
+fx_failures = {}                            # (monnaie, monnaie locale) -> dernière erreur de yahoo!finance ayant empêché le calcul du taux
+fx_lock = threading.Lock()
+fx_pair_locks = {}
+fx_max_age = 4 * 24 * 3600                  # Au-delà (s), une cotation est considérée périmée (week-ends inclus)
+fx_stats = {"lookups": 0, "pairs": 0, "errors": 0}
+FX_PIVOTS = ("USD", "EUR")
+FX_SUBUNITS = {"GBp": ("GBP", 0.01), "GBX": ("GBP", 0.01), "ZAc": ("ZAR", 0.01), "ILA": ("ILS", 0.01)}
+
+
+# Ramener une sous-unité cotée par yahoo!finance (ex. : GBp, pence) à sa monnaie ISO et son facteur
+def normalize_currency(currency):
+    return FX_SUBUNITS.get(currency, (currency.upper() if currency else currency, 1))
+
+
+# Taux de change indisponible à cause de yahoo!finance (panne, limitation), par opposition à une monnaie inconnue (ValueError)
+class ExchangeRateUnavailable(Exception):
+    pass
+
+
+# Télécharger la dernière cotation de plusieurs paires, une requête par paire (cache local d'abord) ; une limitation de débit persistante est relancée,
+# les autres erreurs sont retournées par paire
+def fetch_fx_quotes(pairs):
+    quotes, failed, missing = {}, {}, []
+    for base, quote in pairs:
+        cached = cache_get(f"fx:{base}{quote}", "intraday")
+        if cached is not None:
+            quotes[(base, quote)] = cached
+        else:
+            missing.append((base, quote))
+    if missing:
+        symbols = {f"{base}{quote}=X": (base, quote) for base, quote in missing}
+        fx_stats["lookups"] += 1
+        fx_stats["pairs"] += len(symbols)
+        histories, errors = fetch_histories(list(symbols), period="5d", interval="1d")
+        for symbol, history in histories.items():
+            base, quote = symbols[symbol]
+            series = history["Close"].dropna() if "Close" in history else pd.Series(dtype=float)
+            if series.empty or not series.iloc[-1] > 0:
+                continue
+            quotes[(base, quote)] = (float(series.iloc[-1]), pd.Timestamp(series.index[-1]).timestamp())
+            cache_put(f"fx:{base}{quote}", "intraday", quotes[(base, quote)], time.time() + cache_ttl["intraday"])
+        fx_stats["errors"] += len(errors)
+        for symbol, error in errors.items():
+            if is_rate_limited(error):          # Limitation persistante malgré les reprises : les taux déjà connus restent, marqués périmés
+                raise error
+            console.print(f"[red]Taux {'/'.join(symbols[symbol])} indisponible : {type(error).__name__} : {error}[/red]")
+            failed[symbols[symbol]] = error
+    return quotes, failed
+
+
+# Résoudre un taux à partir des cotations connues : paire directe, inverse, ou triangulation via une monnaie pivot
+def resolve_rate(base, quote, quotes):
+    def leg(a, b):
+        if (a, b) in quotes:
+            return quotes[(a, b)]
+        if (b, a) in quotes:
+            rate, quoted_at = quotes[(b, a)]
+            return 1 / rate, quoted_at
+        return None
+    direct = leg(base, quote)
+    if direct:
+        return direct
+    for pivot in FX_PIVOTS:
+        first, second = leg(base, pivot), leg(pivot, quote)
+        if first and second:
+            return first[0] * second[0], min(first[1], second[1])
+    return None
+
+
+# Charger en lot les taux de plusieurs monnaies vers la monnaie locale dans la matrice (paires directes, puis jambes pivot manquantes)
+def load_exchange_rates(currencies, my_currency):
+    my_currency = normalize_currency(my_currency)[0]
+    now = time.time()
+    with fx_lock:
+        wanted = sorted({normalize_currency(currency)[0] for currency in currencies if currency} - {my_currency})
+        wanted = [base for base in wanted if now - fx_matrix.get((base, my_currency), {}).get("fetched_at", 0) > cache_ttl["intraday"]]
+    if not wanted:
+        return
+    upstream_error = None
+    try:
+        direct = [(base, my_currency) for base in wanted]
+        quotes, failed = fetch_fx_quotes(direct)
+        # Jambes pivot des paires directes manquantes, sans redemander une paire déjà tentée (ex. : pivot = monnaie locale)
+        pivots = [pivot for pivot in FX_PIVOTS if pivot != my_currency]
+        legs = {(base, pivot) for base in wanted if (base, my_currency) not in quotes for pivot in pivots if base != pivot}
+        legs |= {(pivot, my_currency) for base in wanted if (base, my_currency) not in quotes for pivot in pivots}
+        legs -= set(quotes) | set(direct)
+        if legs:
+            leg_quotes, leg_failed = fetch_fx_quotes(sorted(legs))
+            quotes.update(leg_quotes)
+            failed.update(leg_failed)
+        upstream_error = next(iter(failed.values()), None)
+    except Exception as e:
+        console.print(f"[red]Erreur lors du chargement des taux de change : {e}[/red]")
+        quotes, upstream_error = {}, e
+    with fx_lock:
+        for base in wanted:
+            resolved = resolve_rate(base, my_currency, quotes)
+            if resolved:
+                rate, quoted_at = resolved
+                fx_matrix[(base, my_currency)] = {"rate": rate, "quoted_at": quoted_at, "fetched_at": now,
+                                                  "stale": now - quoted_at > fx_max_age}
+                fx_failures.pop((base, my_currency), None)
+            elif (base, my_currency) in fx_matrix:      # Échec du rafraîchissement : conserver l'ancien taux, marqué périmé
+                fx_matrix[(base, my_currency)]["stale"] = True
+            elif upstream_error is not None:            # Aucun taux connu et yahoo!finance en erreur : distinguer d'une monnaie inconnue
+                fx_failures[(base, my_currency)] = upstream_error
+            else:
+                fx_failures.pop((base, my_currency), None)
+
+
+# Consulter la matrice pour une paire (None si le taux est inconnu)
+def exchange_rate_status(ticker_currency, my_currency):
+    (base, base_factor), (quote, quote_factor) = normalize_currency(ticker_currency), normalize_currency(my_currency)
+    factor = 1 if ticker_currency == my_currency else base_factor / quote_factor      # Sous-unités des deux côtés (ex. : GBp → GBP, USD → GBp)
+    if base == quote:
+        return {"rate": factor, "quoted_at": time.time(), "fetched_at": time.time(), "stale": False}
+    entry = fx_matrix.get((base, quote))
+    return dict(entry, rate=entry["rate"] * factor) if entry else None
+
+
+# Obtenir le taux de change entre la monnaie de l'actif financier et la monnaie locale, sans interaction
+@instrumented
+def get_exchange_rate(ticker_currency, my_currency):
+    if ticker_currency == my_currency:
+        return 1
+    pair = (normalize_currency(ticker_currency)[0], normalize_currency(my_currency)[0])
+    with fx_lock:
+        pair_lock = fx_pair_locks.setdefault(pair, threading.Lock())
+    with pair_lock:                             # Une seule requête par paire, même avec plusieurs fils
+        load_exchange_rates([ticker_currency], my_currency)
+    status = exchange_rate_status(ticker_currency, my_currency)
+    if status is None:
+        with fx_lock:
+            error = fx_failures.get(pair)
+        if error is not None:
+            raise ExchangeRateUnavailable(f"Le taux de change {ticker_currency}/{my_currency} est indisponible sur yahoo!finance "
+                                          f"({type(error).__name__} : {error}).") from error
+        raise ValueError(f"Aucun taux de change n'est disponible pour {ticker_currency}/{my_currency} : vérifiez le code ISO de la monnaie.")
+    return status["rate"]
+
+
+# Signaler un taux de change périmé (date de la dernière cotation), sinon rien
+def exchange_rate_note(ticker_currency, my_currency):
+    status = exchange_rate_status(ticker_currency, my_currency)
+    if status and status["stale"]:
+        return f" {RED}(périmé, coté le {datetime.fromtimestamp(status['quoted_at']).strftime('%Y-%m-%d')}){RESET}"
+    return ""
+
+
 # Convertir la monnaie de l'actif financier en monnaie locale déterminée
+@instrumented
 def convert_currency(info):
     ticker_currency = info.get("currency")
-    my_currency = input(f"Votre monnaie en ISO Code (ISO code du ticker : {info.get("currency")}) ---> ").upper()
-    try:
-        if ticker_currency != my_currency:
-            currency_pair = f"{ticker_currency}{my_currency}=X"
-            forex = yf.Ticker(currency_pair)
-            exchange_rate = forex.history(period = "1d")["Close"].iloc[-1]
-            time.sleep(delai)
-        else:
-            exchange_rate = 1
-        return ticker_currency, my_currency, exchange_rate
-    except Exception as e:
-        print(f"{RED}Erreur lors de la conversion : {e}{RESET}")
+    while True:
+        my_currency = input(f"Votre monnaie en ISO Code (ISO code du ticker : {info.get("currency")}) ---> ").strip().upper()
+        try:
+            exchange_rate = get_exchange_rate(ticker_currency, my_currency)
+            return ticker_currency, my_currency, exchange_rate
+        except Exception as e:
+            print(f"{RED}Erreur lors de la conversion : {e}{RESET}")
 
 
 # Récupérer sur yahoo!finance les données qualitatives de l'actif financier via son ticker
+@instrumented
 def get_qualitative_data(info):
     # Afficher les données qualitatives de l'actif financier via son ticker
     qualitative_data = {
@@ -115,97 +875,390 @@ def get_qualitative_data(info):
     return qualitative_data
 
 
-# Récupérer sur yahoo!finance les données quantitatives de l'actif financier via son ticker
-def get_quantitative_data(ticker, info, ticker_currency, my_currency, exchange_rate):
-    # Accéder à l'historique de prix et y déterminer ce qui suit
-    time.sleep(delai)
-    price_data = ticker.history(period="1d")
-    if not price_data.empty:
-        last_price_date = price_data.index[-1].strftime('%Y-%m-%d')                                                         # Dernier prix last de l'actif financier
-        if 'Adj Close' in price_data.columns:                                                                               # Prix de fermeture ajusté comme
-            current_price = price_data["Adj Close"].iloc[-1]                                                                # prix courant de l'actif financier, sinon
-        else:                                                                                                               # Prix de fermeture comme
-            current_price = price_data["Close"].iloc[-1]                                                                    # prix courant de l'actif financier
-        previous_close = info.get("previousClose")                                                                          # Précédent prix de fermeture
-        price_change_value = current_price - previous_close if previous_close else None                                     # Variation de prix (en monnaie)
-        price_change_percent = (price_change_value / previous_close) if previous_close else None                            # Variation de prix (en pourcentage)
-    else:
-        last_price_date = None
-        current_price = None
-        price_change_value = None
-        price_change_percent = None
-
-    # Afficher les données quantitatives de l'actif financier via son ticker
-    quantitative_data = {
-        "Price Date": last_price_date   if last_price_date 
-                                        else "N/A",
-        "ISO Currency Code": info.get("currency")   if info.get("currency") 
-                                                    else "N/A",
-        "My ISO Currency Code": my_currency     if my_currency 
-                                                else "N/A",
-        "Exchange Rate": f"{round(exchange_rate, 4)} {my_currency}/{ticker_currency}",
-        
-        "Current Price": f"{round(current_price * exchange_rate, 2)} {my_currency} <-- {round(current_price, 2)} {info.get('currency')}"    if current_price 
-                                                                                                                                            else "N/A",
-        "Price Change (currency)":  f"{RED}{round(price_change_value * exchange_rate, 2)} {my_currency}{RESET} <-- {RED}{round(price_change_value, 2)} {info.get('currency')}{RESET}"   if price_change_value <= 0 
-                                                                                                                                                                                        else f"{GREEN}+{round(price_change_value * exchange_rate, 2)} {my_currency}{RESET} <-- {GREEN}+{round(price_change_value, 2)} {info.get("currency")}{RESET}",
-        "Price Change (percent)":   f"{RED}{round(price_change_percent * 100, 2)}%{RESET}"  if price_change_percent <= 0 
-                                                                                            else f"{GREEN}+{round(price_change_percent * 100, 2)}%{RESET}",
-        "Forward Earning": f"{round(info.get("epsForward") * exchange_rate, 2)} {my_currency} <-- {round(info.get("lastDividendValue"), 2)} {info.get('currency')}"     if info.get("epsForward") 
-                                                                                                                                                                        else "N/A",
-        "Last Dividend": f"{round(info.get("lastDividendValue") * exchange_rate, 2)} {my_currency} <-- {round(info.get("lastDividendValue"), 2)} {info.get('currency')}"    if info.get("lastDividendValue") 
-                                                                                                                                                                            else "N/A",
-        "Enterprise Value": f"{round(info.get("enterpriseValue") * exchange_rate, 0)} {my_currency} <-- {round(info.get("enterpriseValue"), 0)} {info.get('currency')}"     if info.get("enterpriseValue") 
-                                                                                                                                                                            else "N/A",
-        "Total Cash": f"{round(info.get("totalCash") * exchange_rate, 0)} {my_currency} <-- {round(info.get("totalCash"), 0)} {info.get('currency')}"   if info.get("totalCash") 
-                                                                                                                                                        else "N/A",
-        "Total Debt": f"{round(info.get("totalDebt") * exchange_rate, 0)} {my_currency} <-- {round(info.get("totalDebt"), 0)} {info.get('currency')}"   if info.get("totalDebt") 
-                                                                                                                                                        else "N/A",
-        "Market Capitalization": f"{round(info.get("marketCap") * exchange_rate, 0)} {my_currency} <-- {round(info.get("marketCap"), 0)} {info.get('currency')}"    if info.get("marketCap") 
-                                                                                                                                                                    else "N/A",
-        "Shares outstanding": f"{info.get("sharesOutstanding")} shares"     if info.get("sharesOutstanding") 
-                                                                            else "N/A", 
-        "Number of Employees": f"{info.get("fullTimeEmployees")} employees" if info.get("fullTimeEmployees") 
-                                                                            else "N/A", 
-        "52 Week High": f"{round(info.get('fiftyTwoWeekHigh') * exchange_rate, 2)} {my_currency} <-- {round(info.get('fiftyTwoWeekHigh'), 2)} {info.get('currency')}"   if info.get("fiftyTwoWeekHigh") 
-                                                                                                                                                                        else "N/A", 
-        "52 Week Low": f"{round(info.get('fiftyTwoWeekLow') * exchange_rate, 2)} {my_currency} <-- {round(info.get('fiftyTwoWeekLow'), 2)} {info.get('currency')}"  if info.get("fiftyTwoWeekLow") 
-                                                                                                                                                                    else "N/A", 
-        "Beta": round(info.get("beta"), 5)  if info.get("beta") 
-                                            else "N/A", 
-        "Return on Equity": f"{round(info.get('returnOnEquity') * 100, 2)}%"    if info.get("returnOnEquity") 
-                                                                                else "N/A", 
-        "Dividend Payout Ratio": f"{round(info.get('payoutRatio') * 100, 2)}%"  if info.get("payoutRatio") 
-                                                                                else "N/A", 
-        "Sustainable Growth Rate": f"{round((info.get('returnOnEquity') * (1 - info.get('payoutRatio'))) * 100,2)}%"    if info.get("returnOnEquity") and info.get("payoutRatio") 
+# Moteur de calcul des données quantitatives : une passe vectorisée sur N actifs, NaN pour toute donnée manquante
+INFO_NUMERIC = ["previousClose", "epsForward", "lastDividendValue", "enterpriseValue", "totalCash", "totalDebt", "marketCap",
+                "sharesOutstanding", "fullTimeEmployees", "fiftyTwoWeekHigh", "fiftyTwoWeekLow", "beta", "returnOnEquity",
+                "payoutRatio", "trailingPE", "forwardPE", "pegRatio", "enterpriseToEbitda", "enterpriseToRevenue"]
+INFO_CONVERTED = ["currentPrice", "priceChange", "epsForward", "lastDividendValue", "enterpriseValue", "totalCash", "totalDebt",
+                  "marketCap", "fiftyTwoWeekHigh", "fiftyTwoWeekLow"]
+
+
+
+# Calculer les données quantitatives de N actifs (dictionnaires info) en monnaie locale ; retourne un DataFrame numérique par actif
+def compute_metrics(infos, my_currency=None, rates=None, prices=None, price_dates=None):
+    raw = pd.DataFrame.from_records(infos, columns=["symbol", "currency", *INFO_NUMERIC])
+    metrics = raw[INFO_NUMERIC].apply(pd.to_numeric, errors="coerce").astype("float64")
+    metrics.insert(0, "symbol", raw["symbol"].astype("string"))
+    metrics.insert(1, "currency", raw["currency"].astype("string"))
+    metrics.insert(2, "myCurrency", pd.Series(my_currency, index=raw.index, dtype="string") if my_currency else metrics["currency"])
+
+    # Taux de change par monnaie : fournis, sinon lus dans la matrice (1 si pas de monnaie locale)
+    if rates is None:
+        currencies = metrics["currency"].dropna().unique()
+        if my_currency:
+            load_exchange_rates(currencies, my_currency)
+            rates = {currency: (exchange_rate_status(currency, my_currency) or {}).get("rate", np.nan) for currency in currencies}
+        else:
+            rates = dict.fromkeys(currencies, 1.0)
+    metrics["exchangeRate"] = metrics["currency"].map(rates).astype("float64")
+
+    # Prix courant (historique, sinon yahoo!finance) et variation par rapport à la clôture précédente
+    if prices is None:
+        prices = pd.DataFrame.from_records(infos, columns=["regularMarketPrice"])["regularMarketPrice"]
+    metrics["currentPrice"] = pd.to_numeric(pd.Series(prices, index=raw.index), errors="coerce").astype("float64")
+    metrics["priceDate"] = pd.Series(price_dates if price_dates is not None else pd.NA, index=raw.index, dtype="string")
+    previous_close = metrics["previousClose"].where(metrics["previousClose"] != 0)
+    metrics["priceChange"] = metrics["currentPrice"] - previous_close
+    metrics["priceChangePercent"] = metrics["priceChange"] / previous_close
+    metrics["sustainableGrowthRate"] = metrics["returnOnEquity"] * (1 - metrics["payoutRatio"])
+
+    # Conversion en monnaie locale, en une multiplication par colonne
+    converted = metrics[INFO_CONVERTED].mul(metrics["exchangeRate"], axis=0).add_suffix("Converted")
+    return pd.concat([metrics, converted], axis=1).set_index("symbol", drop=False)
+
+
+# Mettre en forme les données quantitatives d'un actif (ligne de compute_metrics) pour les tableaux rich
+def format_quantitative(metrics, exchange_rate_note=""):
+    my_currency, currency = metrics["myCurrency"], metrics["currency"]
+    def money(field, digits=2):
+        if pd.isna(metrics[field]):
+            return "N/A"
+        return f"{round(metrics[f"{field}Converted"], digits)} {my_currency} <-- {round(metrics[field], digits)} {currency}"
+    def signed(text, value):
+        return f"{RED}{text}{RESET}" if value <= 0 else f"{GREEN}+{text}{RESET}"
+    def number(field, digits=2, scale=1, suffix=""):
+        return f"{round(metrics[field] * scale, digits)}{suffix}" if pd.notna(metrics[field]) else "N/A"
+
+    return {
+        "Price Date": metrics["priceDate"] if pd.notna(metrics["priceDate"]) else "N/A",
+        "ISO Currency Code": currency if pd.notna(currency) else "N/A",
+        "My ISO Currency Code": my_currency if pd.notna(my_currency) else "N/A",
+        "Exchange Rate": f"{round(metrics['exchangeRate'], 4)} {my_currency}/{currency}{exchange_rate_note}",
+        "Current Price": money("currentPrice"),
+        "Price Change (currency)": f"{signed(f"{round(metrics['priceChangeConverted'], 2)} {my_currency}", metrics['priceChange'])} <-- "
+                                   f"{signed(f"{round(metrics['priceChange'], 2)} {currency}", metrics['priceChange'])}"    if pd.notna(metrics["priceChange"])
+                                                                                                                            else "N/A",
+        "Price Change (percent)": signed(f"{round(metrics['priceChangePercent'] * 100, 2)}%", metrics["priceChange"])   if pd.notna(metrics["priceChangePercent"])
                                                                                                                         else "N/A",
-        "Trailing P/E": round(info.get("trailingPE"), 2)    if info.get("trailingPE") 
-                                                            else "N/A",
-        "Forward P/E": round(info.get("forwardPE"), 2)  if info.get("forwardPE") 
-                                                        else "N/A",
-        "PEG Ratio": round(info.get("pegRatio"), 2)     if info.get("pegRatio") 
-                                                        else "N/A",
-        "EV/EBITDA": round(info.get("enterpriseToEbitda"), 2)   if info.get("enterpriseToEbitda") 
-                                                                else "N/A",
-        "EV/Revenue": round(info.get("enterpriseToRevenue"), 2)     if info.get("enterpriseToRevenue") 
-                                                                    else "N/A",
+        "Forward Earning": money("epsForward"),
+        "Last Dividend": money("lastDividendValue"),
+        "Enterprise Value": money("enterpriseValue", 0),
+        "Total Cash": money("totalCash", 0),
+        "Total Debt": money("totalDebt", 0),
+        "Market Capitalization": money("marketCap", 0),
+        "Shares outstanding": f"{metrics['sharesOutstanding']:.0f} shares"  if pd.notna(metrics["sharesOutstanding"])
+                                                                            else "N/A",
+        "Number of Employees": f"{metrics['fullTimeEmployees']:.0f} employees"  if pd.notna(metrics["fullTimeEmployees"])
+                                                                                else "N/A",
+        "52 Week High": money("fiftyTwoWeekHigh"),
+        "52 Week Low": money("fiftyTwoWeekLow"),
+        "Beta": number("beta", 5),
+        "Return on Equity": number("returnOnEquity", 2, 100, "%"),
+        "Dividend Payout Ratio": number("payoutRatio", 2, 100, "%"),
+        "Sustainable Growth Rate": number("sustainableGrowthRate", 2, 100, "%"),
+        "Trailing P/E": number("trailingPE"),
+        "Forward P/E": number("forwardPE"),
+        "PEG Ratio": number("pegRatio"),
+        "EV/EBITDA": number("enterpriseToEbitda"),
+        "EV/Revenue": number("enterpriseToRevenue"),
     }
 
-    return quantitative_data
 
+# Obtenir le dernier prix de l'actif financier et sa date via son historique (None, NaN si indisponible)
+def current_price_data(ticker, info):
+    price_data = period_history(ticker, "1d", info.get("exchangeTimezoneName"))
+    if price_data.empty:
+        return None, np.nan
+    last_price_date = price_data.index[-1].strftime('%Y-%m-%d')                                                             # Dernier prix last de l'actif financier
+    if 'Adj Close' in price_data.columns and pd.notna(price_data["Adj Close"].iloc[-1]):                                    # Prix de fermeture ajusté comme
+        return last_price_date, price_data["Adj Close"].iloc[-1]                                                            # prix courant de l'actif financier, sinon
+    return last_price_date, price_data["Close"].iloc[-1]                                                                    # prix de fermeture
 
-# Emettre le graphique d'évolution de prix de l'actif financier via son ticker
-def chart(input_ticker, info, ticker, exchange_rate, my_currency):
-    # Indiquer les périodes et labels du grpahique
-    periods = {
-        "1": "3d", "2": "5d", "3": "1mo", "4": "3mo", 
-        "5": "6mo", "6": "1y", "7":"5y", "8": "10y", "9": "max"
-    }
-    labels = {
-        "1": "3 jours", "2": "5 jours", "3": "1 mois", "4": "1 trimestre", 
-        "5": "1 semestre", "6": "1 an", "7": "5 ans", "8": "10 ans", "9": "Depuis le début"
+
+# Calculer les indicateurs numériques d'un actif financier au dernier prix (tableau d'une ligne de compute_metrics)
+def asset_metrics(ticker, info, ticker_currency, my_currency, exchange_rate):
+    last_price_date, current_price = current_price_data(ticker, info)
+    return compute_metrics([info], my_currency, {ticker_currency: exchange_rate}, [current_price], [last_price_date])
+
+
+# Récupérer sur yahoo!finance les données quantitatives de l'actif financier via son ticker
+@instrumented
+def get_quantitative_data(ticker, info, ticker_currency, my_currency, exchange_rate, metrics=None):
+    metrics = asset_metrics(ticker, info, ticker_currency, my_currency, exchange_rate) if metrics is None else metrics
+    return format_quantitative(metrics.iloc[0], exchange_rate_note(ticker_currency, my_currency))
+
+
+# Analyses historiques : rendements, volatilité, perte maximale, bêta et corrélations, vectorisés sur des prix alignés (dates x actifs)
+benchmark_ticker = "^GSPC"                  # Indice de référence du bêta (S&P 500)
+analytics_budget = 512 * 1024 ** 2          # Budget mémoire (octets) des calculs, traités par blocs d'actifs en float32
+TRADING_DAYS = 252
+
+
+
+# Calculer les rendements logarithmiques de prix alignés (T x N), prix manquants reportés depuis la veille
+def log_returns(prices):
+    prices = pd.DataFrame(prices).ffill().to_numpy(dtype=np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(prices), axis=0)
+
+
+# Calculer la volatilité annualisée de chaque actif à partir de ses rendements (T x N)
+def annualized_volatility(returns, periods_per_year=TRADING_DAYS):
+    counts = np.sum(~np.isnan(returns), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        volatility = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(periods_per_year)
+    return np.where(counts > 1, volatility, np.nan)
+
+
+# Calculer la perte en pourcentage depuis le plus haut atteint (T x N), puis la perte maximale de chaque actif
+def drawdowns(prices):
+    prices = pd.DataFrame(prices).ffill().to_numpy(dtype=np.float32)
+    peaks = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return prices / peaks - 1
+
+
+def max_drawdown(prices):
+    drawdown = drawdowns(prices)
+    return np.where(np.all(np.isnan(drawdown), axis=0), np.nan, np.nanmin(np.where(np.isnan(drawdown), 0, drawdown), axis=0))
+
+
+# Calculer le bêta glissant (fenêtre de "window" rendements) de chaque actif contre l'indice, via des sommes cumulées
+def rolling_beta(returns, benchmark_returns, window=63):
+    benchmark = np.broadcast_to(np.asarray(benchmark_returns, dtype=np.float64).reshape(-1, 1), returns.shape)
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark)
+    x, b = np.where(valid, returns, 0.0), np.where(valid, benchmark, 0.0)
+
+    def windowed(values):
+        sums = np.cumsum(values, axis=0, dtype=np.float64)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums
+
+    n, sx, sb, sxb, sbb = windowed(valid), windowed(x), windowed(b), windowed(x * b), windowed(b * b)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        beta = (sxb - sx * sb / n) / (sbb - sb * sb / n)
+    beta[n < max(2, window // 2)] = np.nan
+    return beta.astype(np.float32)
+
+
+# Calculer le bêta de chaque actif contre l'indice sur toute la période
+def beta(returns, benchmark_returns):
+    return rolling_beta(returns, benchmark_returns, window=len(returns))[-1] if len(returns) else np.full(returns.shape[1], np.nan)
+
+
+# Calculer la matrice de corrélation N x N des rendements, bloc par bloc (rendements manquants ramenés à la moyenne)
+def correlation_matrix(returns, chunk_size=256):
+    means = np.nanmean(returns, axis=0)
+    centered = np.where(np.isnan(returns), 0, returns - means).astype(np.float32)
+    norms = np.sqrt(np.sum(centered * centered, axis=0))
+    norms[norms == 0] = np.nan
+    correlation = np.empty((returns.shape[1], returns.shape[1]), dtype=np.float32)
+    for start in range(0, returns.shape[1], chunk_size):
+        block = slice(start, start + chunk_size)
+        correlation[block] = (centered[:, block].T @ centered) / np.outer(norms[block], norms)
+    return np.clip(correlation, -1, 1)
+
+
+# Calculer les indicateurs de risque de N actifs (prix de clôture alignés, une colonne par actif), par blocs selon le budget mémoire
+def risk_analytics(closes, benchmark_closes=None, window=63):
+    closes = closes.sort_index()
+    benchmark_returns = None
+    if benchmark_closes is not None and not benchmark_closes.empty:
+        benchmark_returns = log_returns(benchmark_closes.reindex(closes.index).to_frame())[:, 0]
+    chunk = max(1, analytics_budget // max(1, len(closes) * 80))        # ~80 octets par cellule (tableaux intermédiaires float32/float64)
+    results = []
+    for start in range(0, closes.shape[1], chunk):
+        block = closes.iloc[:, start:start + chunk]
+        prices = block.to_numpy(dtype=np.float32)
+        returns = log_returns(prices)
+        first = pd.DataFrame(prices).bfill().to_numpy()[0] if len(prices) else np.full(prices.shape[1], np.nan)
+        last = pd.DataFrame(prices).ffill().to_numpy()[-1] if len(prices) else np.full(prices.shape[1], np.nan)
+        metrics = pd.DataFrame({
+            "totalReturn": last / first - 1,
+            "annualizedVolatility": annualized_volatility(returns),
+            "maxDrawdown": max_drawdown(prices),
+            "beta": beta(returns, benchmark_returns) if benchmark_returns is not None else np.nan,
+            "rollingBeta": rolling_beta(returns, benchmark_returns, window)[-1] if benchmark_returns is not None and len(returns) else np.nan,
+        }, index=block.columns, dtype="float64")
+        results.append(metrics)
+    return pd.concat(results) if results else pd.DataFrame(columns=["totalReturn", "annualizedVolatility", "maxDrawdown", "beta", "rollingBeta"])
+
+
+# Aligner les prix de clôture de plusieurs historiques sur un calendrier commun de dates (float32, une colonne par actif)
+def align_closes(histories):
+    closes = {}
+    for symbol, history in histories.items():
+        if history is not None and not history.empty:
+            dates = history.index.tz_localize(None).normalize() if history.index.tz is not None else history.index.normalize()
+            close = pd.Series(history["Close"].to_numpy(dtype=np.float32), index=dates)
+            closes[symbol] = close[~close.index.duplicated(keep="last")]
+    return pd.DataFrame(closes, dtype=np.float32).sort_index()
+
+
+# Calculer les indicateurs de risque d'un actif sur une période, contre l'indice de référence
+@instrumented
+def asset_risk(ticker, info, period="1y", window=63):
+    timezone_name = info.get("exchangeTimezoneName")
+    histories = {ticker.ticker: period_history(ticker, period, timezone_name)}
+    try:
+        benchmark = align_closes({benchmark_ticker: period_history(ticker_factory(benchmark_ticker), period)})
+    except Exception:
+        benchmark = pd.DataFrame()
+    closes = align_closes(histories)
+    benchmark_closes = benchmark[benchmark_ticker] if benchmark_ticker in benchmark else None
+    return risk_analytics(closes, benchmark_closes, window).reindex([ticker.ticker]).iloc[0]
+
+
+# Mettre en forme les indicateurs de risque d'un actif pour les tableaux rich
+def format_risk(risk, period="1y", window=63):
+    def percent(value):
+        return f"{round(value * 100, 2)}%" if pd.notna(value) else "N/A"
+    return {
+        f"Return ({period})": percent(risk["totalReturn"]),
+        f"Annualized Volatility ({period})": percent(risk["annualizedVolatility"]),
+        f"Max Drawdown ({period})": percent(risk["maxDrawdown"]),
+        f"Beta vs {benchmark_ticker} ({period})": round(risk["beta"], 5) if pd.notna(risk["beta"]) else "N/A",
+        f"Rolling Beta vs {benchmark_ticker} ({window}d)": round(risk["rollingBeta"], 5) if pd.notna(risk["rollingBeta"]) else "N/A",
     }
 
+
+# Charger en parallèle les historiques d'une liste de tickers et en calculer les indicateurs de risque et la matrice de corrélation
+def watchlist_risk(tickers, period="1y", window=63, workers=8):
+    tickers = list(dict.fromkeys(tickers))     # Chaque ticker, indice de référence compris, n'est chargé qu'une fois
+    def load(input_ticker):
+        return align_closes({input_ticker: period_history(ticker_factory(input_ticker), period)})
+    columns, errors = [], {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(load, input_ticker): input_ticker for input_ticker in dict.fromkeys([*tickers, benchmark_ticker])}
+        for future in as_completed(futures):
+            try:
+                columns.append(future.result())
+            except Exception as e:
+                errors[futures[future]] = e
+    closes = pd.concat(columns, axis=1).sort_index() if columns else pd.DataFrame(dtype=np.float32)
+    benchmark_closes = closes.get(benchmark_ticker)
+    closes = closes[[input_ticker for input_ticker in tickers if input_ticker in closes]]
+    risk = risk_analytics(closes, benchmark_closes, window)
+    correlation = pd.DataFrame(correlation_matrix(log_returns(closes.to_numpy(dtype=np.float32))), index=closes.columns, columns=closes.columns)
+    return risk, correlation, errors
+
+
+# Afficher les indicateurs de risque d'une liste de tickers, et exporter la matrice de corrélation
+def risk_display(tickers, period="1y", window=63, workers=8, correlation_path=None):
+    start = time.perf_counter()
+    risk, correlation, errors = watchlist_risk(tickers, period, window, workers)
+    table = Table(title=f"Indicateurs de risque sur {period} ({datetime.now().date()})")
+    table.add_column("Ticker")
+    for key in format_risk(pd.Series(np.nan, index=risk.columns), period, window):
+        table.add_column(key)
+    for symbol, row in risk.iterrows():
+        table.add_row(symbol, *[str(value) for value in format_risk(row, period, window).values()])
+    console.print(table)
+    for input_ticker, error in errors.items():
+        console.print(f"[red]{input_ticker} : {type(error).__name__} : {error}[/red]")
+    if correlation_path:
+        correlation.to_csv(correlation_path)
+        console.print(f"Matrice de corrélation ({len(correlation)} x {len(correlation)}) exportée : {correlation_path}")
+    console.print(f"{len(risk)} actifs analysés en {time.perf_counter() - start:.2f} s")
+    return errors
+
+
+
+# Périodes et labels du graphique (par choix de la légende)
+CHART_PERIODS = {
+    "1": "3d", "2": "5d", "3": "1mo", "4": "3mo", 
+    "5": "6mo", "6": "1y", "7":"5y", "8": "10y", "9": "max"
+}
+CHART_LABELS = {
+    "1": "3 jours", "2": "5 jours", "3": "1 mois", "4": "1 trimestre", 
+    "5": "1 semestre", "6": "1 an", "7": "5 ans", "8": "10 ans", "9": "Depuis le début"
+}
+chart_size = (16, 6)                        # Dimensions du graphique en pouces (100 pixels par pouce)
+
+
+
+# Réduire une série à une paire (minimum, maximum) par tranche, soit environ deux points par pixel, en conservant sa forme
+def downsample_minmax(x, y, buckets):
+    if len(y) <= 2 * buckets:
+        return x, y
+    size = -(-len(y) // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:len(y)] = y
+    padded = padded.reshape(buckets, size)
+    filled = ~np.all(np.isnan(padded), axis=1)
+    offsets = np.arange(buckets)[filled] * size
+    rows = padded[filled]
+    index = np.unique(np.concatenate([[0, len(y) - 1], offsets + np.nanargmin(rows, axis=1), offsets + np.nanargmax(rows, axis=1)]))
+    return x[index], y[index]
+
+
+# Préparer les séries d'un graphique : prix convertis et perte depuis le plus haut, datés en jours matplotlib et sous-échantillonnés
+def chart_data(period_data, exchange_rate, width_px=chart_size[0] * 100):
+    close = period_data["Close"].dropna()
+    index = close.index.tz_localize(None) if close.index.tz is not None else close.index
+    x = np.asarray(index, dtype="datetime64[ns]").astype(np.int64) / 86_400e9        # Jours depuis 1970 (dates matplotlib)
+    y = close.to_numpy(dtype=np.float64) * exchange_rate
+    drawdown = drawdowns(y.reshape(-1, 1))[:, 0] * 100
+    return {"points": len(y), "price": downsample_minmax(x, y, width_px), "drawdown": downsample_minmax(x, drawdown, width_px)}
+
+
+# Placer les dates de l'axe horizontal selon la période
+def set_period_axis(ax, period):
+    if period == "3d":
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %Hh'))
+        ax.xaxis.set_major_locator(mdates.HourLocator(interval=6))
+    elif period == "5d":
+        ax.xaxis.set_major_locator(mdates.DayLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %Hh'))
+    elif period in ["1mo", "3mo", "6mo"]:
+        ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=1))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    elif period in ["1y", "5y", "10y"]:
+        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=6))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+    else:
+        ax.xaxis.set_major_locator(mdates.YearLocator(base=1))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    ax.xaxis.set_minor_locator(mlocat.NullLocator())
+
+
+# Construire une fois les axes et tracés d'un graphique (prix, puis perte depuis le plus haut), réutilisables d'un actif à l'autre
+def setup_chart(fig):
+    ax, ax_drawdown = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+    line, = ax.plot([], [], label="Prix (converti)", color="blue")
+    drawdown_line, = ax_drawdown.plot([], [], color="red", linewidth=0.5)
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5, color='gray')
+    ax.minorticks_on()
+    ax.legend(loc="upper left")
+    ax_drawdown.set_xlabel("Date", fontweight='bold')
+    ax_drawdown.set_ylabel("Perte (%)", fontweight='bold')
+    ax_drawdown.grid(True, which='both', linestyle='--', linewidth=0.5, color='gray')
+    title = ax.set_title("", fontweight='bold')
+    return {"figure": fig, "price": ax, "drawdown": ax_drawdown, "line": line, "drawdown_line": drawdown_line, "fill": None, "title": title}
+
+
+# Tracer les séries d'un actif sur un graphique déjà construit (seules les données, bornes et libellés changent)
+def draw_chart(state, data, period, title, ylabel):
+    ax, ax_drawdown = state["price"], state["drawdown"]
+    (x, y), (drawdown_x, drawdown) = data["price"], data["drawdown"]
+    state["line"].set_data(x, y)
+    state["drawdown_line"].set_data(drawdown_x, drawdown)
+    if state["fill"] is not None:
+        state["fill"].remove()
+    state["fill"] = ax_drawdown.fill_between(drawdown_x, drawdown, 0, color="red", alpha=0.3, label="Perte depuis le plus haut")
+    ax_drawdown.legend(loc="lower left")
+    state["title"].set_text(title)
+    ax.set_ylabel(ylabel, fontweight='bold')
+    set_period_axis(ax, period)
+    ax.set_xlim((x[0], x[-1]) if len(x) > 1 else (x[0] - 1, x[0] + 1))
+    margin = (np.max(y) - np.min(y)) * 0.05 or abs(np.max(y)) * 0.05 or 1
+    ax.set_ylim(np.min(y) - margin, np.max(y) + margin)
+    ax_drawdown.set_ylim(min(np.min(drawdown) * 1.05, -1), 0)
+
+
+# Emettre le graphique d'évolution de prix de l'actif financier via son ticker
+@instrumented
+def chart(input_ticker, info, ticker, exchange_rate, my_currency):
     # Boucle de la composition du graphique d'évolution de prix de l'actif financier
     while True:
         # Afficher d'une légende pour faciliter le choix de la période
@@ -215,71 +1268,128 @@ def chart(input_ticker, info, ticker, exchange_rate, my_currency):
         
         # Choisir la période et paramétrer le label
         period_choice = input(f"{ROSE}---> Votre choix est un graphique de {input_ticker} sur une période{RESET} #").strip()
-        period = periods.get(period_choice)
-        label = labels.get(period_choice)
+        period = CHART_PERIODS.get(period_choice)
+        label = CHART_LABELS.get(period_choice)
         if not period:
             print(f"{RED}Choix invalide. Veuillez réessayer.{RESET}")
             continue
 
         # Vérifier la période choisie et Convertir les prix en monnaie locale
-        period_data = ticker.history(period = period)
-        time.sleep(delai)
+        period_data = period_history(ticker, period, info.get("exchangeTimezoneName"))
         if period_data.empty:
             print(f"{RED}Aucune donnée n'est disponible pour cette période. Veuillez réessayez.{RESET}")
             continue
-        period_data["Converted_Close"] = period_data["Close"] * exchange_rate
 
         # Indiquer les paramètres du graphique de l'évolution de prix de l'actif financier
-        plt.figure(figsize=(16, 5))
-        plt.plot(period_data.index, period_data["Converted_Close"], label="Prix (converti)", color="blue")
-        plt.title(f"Évolution du prix de {info.get('longName')} (sur {label}, {datetime.now().date()})", fontweight='bold')
-        plt.xlabel("Date", fontweight='bold')
-        plt.ylabel(f"Prix (en {my_currency})", fontweight='bold')
-        plt.grid(True, which='both', linestyle='--', linewidth=0.5, color='gray')
-        plt.minorticks_on()
-
-        ax = plt.gca()
-        if period == "3d":
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %Hh'))
-            ax.xaxis.set_major_locator(mdates.HourLocator(interval=6))
-        elif period == "5d":
-            ax.xaxis.set_major_locator(mdates.DayLocator())
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %Hh'))
-        elif period in ["1mo", "3mo", "6mo"]:
-            ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=1))
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        elif period in ["1y", "5y", "10y"]:
-            ax.xaxis.set_major_locator(mdates.MonthLocator(interval=6))
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-        else:
-            ax.xaxis.set_major_locator(mdates.YearLocator(base=1))
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-        ax.xaxis.set_minor_locator(mlocat.NullLocator())
-
-        plt.legend()
-        plt.margins(x=0)
-        plt.autoscale(enable=True, axis='x', tight=True)
+        state = setup_chart(plt.figure(figsize=chart_size))
+        draw_chart(state, chart_data(period_data, exchange_rate), period,
+                   f"Évolution du prix de {info.get('longName')} (sur {label}, {datetime.now().date()})", f"Prix (en {my_currency})")
         plt.tight_layout()
         plt.show()
 
         break
     
 
+# Rendre sans affichage (Agg) une liste de graphiques sur une seule figure réutilisée ; retourne les durées de mise en place et de rendu
+@instrumented
+def render_charts(jobs, image_format="png"):
+    start = time.perf_counter()
+    fig = Figure(figsize=chart_size, dpi=100)
+    FigureCanvasAgg(fig)
+    state = setup_chart(fig)
+    fig.subplots_adjust(left=0.07, right=0.99, top=0.94, bottom=0.08, hspace=0.08)    # Marges fixes : un seul tracé par graphique
+    options = {"pil_kwargs": {"compress_level": 1}} if image_format == "png" else {}
+    setup_time = time.perf_counter() - start
+    for job in jobs:
+        draw_chart(state, job["data"], job["period"], job["title"], job["ylabel"])
+        fig.savefig(job["path"], format=image_format, **options)
+    return setup_time, time.perf_counter() - start - setup_time
+
+
+# Préparer les graphiques d'un actif sur plusieurs périodes (un seul historique téléchargé par nature, découpé localement)
+def chart_jobs(input_ticker, periods, my_currency, output_dir, image_format):
+    ticker, info = load_ticker(input_ticker)
+    ticker_currency = info.get("currency")
+    my_currency = my_currency or ticker_currency
+    exchange_rate = get_exchange_rate(ticker_currency, my_currency)
+    labels = {CHART_PERIODS[choice]: CHART_LABELS[choice] for choice in CHART_PERIODS}
+    jobs = []
+    for period in periods:
+        period_data = period_history(ticker, period, info.get("exchangeTimezoneName"))
+        if period_data.empty:
+            continue
+        jobs.append({"path": os.path.join(output_dir, f"{re.sub(r'[^\w.=-]', '_', input_ticker)}_{period}.{image_format}"),
+                     "data": chart_data(period_data, exchange_rate), "period": period,
+                     "title": f"Évolution du prix de {info.get('longName')} (sur {labels.get(period, period)}, {datetime.now().date()})",
+                     "ylabel": f"Prix (en {my_currency})"})
+    return jobs
+
+
+# Générer sans affichage les graphiques d'une liste de tickers et périodes (rendu éventuellement réparti sur plusieurs processus), puis en mesurer les étapes
+def render_display(tickers, periods, my_currency=None, output_dir="charts", image_format="png", workers=8, processes=1):
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    jobs, errors = [], {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(chart_jobs, input_ticker, periods, my_currency, output_dir, image_format): input_ticker for input_ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                jobs.extend(future.result())
+            except Exception as e:
+                errors[futures[future]] = e
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if processes > 1 and len(jobs) > 1:
+        shards = [jobs[i::processes] for i in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            timings = list(pool.map(render_charts, shards, [image_format] * len(shards)))
+    else:
+        timings = [render_charts(jobs, image_format)]
+    render_time = time.perf_counter() - start
+
+    table = Table(title=f"Rendu de {len(jobs)} graphiques ({len(tickers)} tickers x {len(periods)} périodes, {max(1, processes)} processus)")
+    table.add_column("Étape")
+    table.add_column("Durée (s)")
+    table.add_row("Chargement des historiques et préparation des séries", f"{load_time:.2f}")
+    table.add_row("Mise en place des figures (cumulée)", f"{sum(setup for setup, _ in timings):.2f}")
+    table.add_row("Rendu et écriture (cumulés)", f"{sum(render for _, render in timings):.2f}")
+    table.add_row("Rendu, durée écoulée", f"{render_time:.2f} ({len(jobs) / render_time if render_time else 0:.1f} graphiques/s)")
+    console.print(table)
+    points = sum(job["data"]["points"] for job in jobs)
+    drawn = sum(len(job["data"]["price"][1]) for job in jobs)
+    console.print(f"Points tracés : {drawn} sur {points} ({output_dir})")
+    for input_ticker, error in errors.items():
+        console.print(f"[red]{input_ticker} : {type(error).__name__} : {error}[/red]")
+    return errors
+
+
+# Afficher un tableau de données (une ligne par donnée) sous un titre
+@instrumented
+def print_table(title, data):
+    console.print(Panel(f"[bold yellow]--- {title} ({datetime.now().date()}) ---[bold yellow]"))
+    table = Table(title=None, show_header=False)
+    for key, value in data.items():
+        table.add_row(key, str(value), end_section=True)
+    console.print(table)
+
+
 # Afficher les données qualitatives et quantitatives extraites sur l'actif financier via son ticker
+@instrumented
 def results_display(input_ticker, ticker, info, ticker_currency, my_currency, exchange_rate):
-    console.print(Panel(f"[bold yellow]--- INFORMATIONS QUALITATITVES POUR {input_ticker} ({datetime.now().date()}) ---[bold yellow]"))
     qualitative_data = get_qualitative_data(info)
-    table_qual = Table(title=None, show_header=False)
-    for key, value in qualitative_data.items():
-        table_qual.add_row(key, str(value), end_section=True)
-    console.print(table_qual)
-    
-    console.print(Panel(f"[bold yellow]--- INFORMATIONS QUANTITATIVES POUR {input_ticker} ({datetime.now().date()}) ---[bold yellow]"))
+    print_table(f"INFORMATIONS QUALITATITVES POUR {input_ticker}", qualitative_data)
+
     quantitative_data = get_quantitative_data(ticker, info, ticker_currency, my_currency, exchange_rate)
-    table_quant = Table(title=None, show_header=False)
-    for key, value in quantitative_data.items():
-        table_quant.add_row(key, str(value), end_section=True)
-    console.print(table_quant)
+    print_table(f"INFORMATIONS QUANTITATIVES POUR {input_ticker}", quantitative_data)
+
+    try:
+        risk = asset_risk(ticker, info)
+    except Exception as e:                      # Historique journalier indisponible : indicateurs "N/A" plutôt qu'un arrêt du profil
+        print(f"{RED}Erreur lors du calcul des indicateurs de risque : {e}{RESET}")
+        risk = pd.Series(np.nan, index=["totalReturn", "annualizedVolatility", "maxDrawdown", "beta", "rollingBeta"])
+    risk_data = format_risk(risk)
+    print_table(f"INDICATEURS DE RISQUE POUR {input_ticker}", risk_data)
 
 
 # Préparer l'affichage final des résultats sur l'actif financier
@@ -309,9 +1419,1078 @@ def final_display():
             break
             
         
+# Secteurs, industries et places des actifs fictifs (réparties selon le ticker)
+OFFLINE_INDUSTRIES = [("Industrials", "Railroads"), ("Industrials", "Aerospace & Defense"), ("Technology", "Software - Application"),
+                      ("Technology", "Semiconductors"), ("Financial Services", "Banks - Diversified"), ("Energy", "Oil & Gas Integrated"),
+                      ("Healthcare", "Drug Manufacturers - General"), ("Utilities", "Utilities - Regulated Electric")]
+OFFLINE_EXCHANGES = {"USD": "NYQ", "CAD": "TOR", "EUR": "PAR", "GBP": "LSE", "JPY": "JPX", "CHF": "EBS"}
+
+
+# Actif fictif hors ligne imitant yf.Ticker (info et history), pour mesurer le débit sans solliciter yahoo!finance
+class OfflineTicker:
+    def __init__(self, symbol, latency=0.2):
+        self.ticker = symbol.upper()
+        self.latency = latency
+        self.seed = zlib.crc32(self.ticker.encode())
+
+    @property
+    def info(self):
+        time.sleep(self.latency)
+        rng = np.random.default_rng(self.seed)
+        currency = ["USD", "CAD", "EUR", "GBP", "JPY", "CHF"][self.seed % 6]
+        sector, industry = OFFLINE_INDUSTRIES[(self.seed // 6) % len(OFFLINE_INDUSTRIES)]
+        price = float(rng.uniform(5, 500))
+        return {
+            "shortName": self.ticker, "longName": f"{self.ticker} Offline Corp.", "symbol": self.ticker,
+            "quoteType": "EQUITY", "currency": currency, "sector": sector, "industry": industry,
+            "exchange": OFFLINE_EXCHANGES[currency],
+            "country": "Canada", "previousClose": price * float(rng.uniform(0.95, 1.05)),
+            "epsForward": price / 20, "lastDividendValue": price / 100, "enterpriseValue": price * 1e9,
+            "totalCash": price * 1e7, "totalDebt": price * 2e7, "marketCap": price * 8e8,
+            "sharesOutstanding": 800_000_000, "fullTimeEmployees": 25_000,
+            "fiftyTwoWeekHigh": price * 1.2, "fiftyTwoWeekLow": price * 0.8, "beta": float(rng.uniform(0.5, 1.5)),
+            "returnOnEquity": float(rng.uniform(0.05, 0.3)), "payoutRatio": float(rng.uniform(0, 0.8)),
+            "trailingPE": float(rng.uniform(8, 40)), "forwardPE": float(rng.uniform(8, 40)),
+            "pegRatio": float(rng.uniform(0.5, 3)), "enterpriseToEbitda": float(rng.uniform(5, 25)),
+            "enterpriseToRevenue": float(rng.uniform(1, 10)),
+        }
+
+    def history(self, period="1mo", interval="1d", start=None, end=None, **kwargs):
+        time.sleep(self.latency)
+        days = {"1d": 1, "3d": 3, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126,
+                "1y": 252, "5y": 1260, "10y": 2520, "max": 7560}.get(period, 21)
+        intraday = interval in INTRADAY
+        # Série complète générée à l'identique à chaque appel (mêmes prix aux mêmes dates), puis découpée
+        index = pd.bdate_range(end=datetime.now().date(), periods=60 if intraday else 7560, tz="America/New_York")
+        if intraday:                            # Barres de 30 minutes de 9h30 à 16h
+            index = index.repeat(13) + pd.to_timedelta(np.tile(570 + 30 * np.arange(13), len(index)), unit="min")
+        rng = np.random.default_rng(self.seed)
+        base = float(rng.uniform(0.5, 1.5)) if self.ticker.endswith("=X") else float(rng.uniform(5, 500))
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+        history = pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99,
+                                "Close": close, "Volume": 1_000_000}, index=index)
+        if start is not None:
+            return history[history.index >= pd.Timestamp(start).tz_localize(index.tz)]
+        return history.iloc[-days * (13 if intraday else 1):]
+
+
+# Enregistrement et rejeu : données yahoo!finance (info et historiques) capturées une fois, puis rejouées hors ligne dans tout le parcours
+REPLAY_STAGES = ["get_ticker", "convert_currency", "get_qualitative_data", "get_quantitative_data", "results_display", "chart"]
+replay_tolerance = 0.25                     # Écart relatif au-delà duquel une étape est signalée en régression
+
+
+# Ajouter à un fichier de rejeu un historique reçu de yahoo!finance (fusionné avec les barres déjà capturées)
+def record_history(fixtures, symbol, interval, history):
+    key = (symbol, interval)
+    stored = fixtures["histories"].get(key)
+    fixtures["histories"][key] = history.copy() if stored is None else history.combine_first(stored)
+
+
+# Actif enregistreur : transmet les appels à l'actif réel et capture leurs réponses
+class RecordingTicker:
+    def __init__(self, upstream, fixtures):
+        self.ticker = upstream.ticker
+        self.upstream = upstream
+        self.fixtures = fixtures
+
+    @property
+    def info(self):
+        info = self.upstream.info
+        self.fixtures["infos"][self.ticker] = dict(info)
+        return info
+
+    def history(self, **kwargs):
+        history = self.upstream.history(**kwargs)
+        record_history(self.fixtures, self.ticker, kwargs.get("interval", "1d"), history)
+        return history
+
+
+# Actif rejoué imitant yf.Ticker à partir d'un fichier de rejeu (info vide si le ticker n'a pas été enregistré)
+class ReplayTicker:
+    def __init__(self, symbol, fixtures):
+        self.ticker = symbol.upper()
+        self.fixtures = fixtures
+
+    @property
+    def info(self):
+        return dict(self.fixtures["infos"].get(self.ticker, {}))
+
+    def history(self, period="1mo", interval="1d", start=None, **kwargs):
+        history = self.fixtures["histories"].get((self.ticker, interval))
+        if history is None or history.empty:
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+        if start is not None:
+            start = pd.Timestamp(start)
+            if history.index.tz is not None:
+                start = start.tz_localize(history.index.tz) if start.tzinfo is None else start.tz_convert(history.index.tz)
+            return history[history.index >= start].copy()
+        if period in PERIOD_DAYS or period == "5d":
+            days = history.index.normalize()
+            return history[days >= days.unique()[-PERIOD_DAYS.get(period, 5):][0]].copy()
+        if period in PERIOD_OFFSETS:
+            return history[history.index >= history.index[-1] - PERIOD_OFFSETS[period]].copy()
+        return history.copy()
+
+
+# Remplacer input() par des réponses préparées (arrêt si le parcours redemande une saisie, ex. : réponse refusée)
+def scripted_input(answers):
+    answers = list(answers)
+    def answer(prompt=""):
+        if not answers:
+            raise SystemExit(f"{RED}Rejeu interrompu : saisie inattendue ({prompt.strip()}){RESET}")
+        return answers.pop(0)
+    return answer
+
+
+# Repartir d'un état vide (cache désactivé, entrepôt, historiques et taux en mémoire) pour que chaque passe parte de zéro
+def reset_pipeline_state():
+    history_store.clear()
+    fx_matrix.clear()
+    fx_failures.clear()
+    shutil.rmtree(os.path.join(cache_dir, "history"), ignore_errors=True)
+
+
+# Parcourir les étapes du mode interactif pour un actif (réponses préparées, sorties écartées), en mesurant chacune
+def run_pipeline(input_ticker, my_currency=None, chart_choice="6", measure=None):
+    measure = measure or (lambda stage, function: function())
+    state = {}
+    def stage_get_ticker():
+        builtins.input = scripted_input([input_ticker])
+        state["input_ticker"], state["ticker"], state["info"] = get_ticker()
+    def stage_convert_currency():
+        builtins.input = scripted_input([my_currency or state["info"].get("currency")])
+        state["ticker_currency"], state["my_currency"], state["exchange_rate"] = convert_currency(state["info"])
+    def stage_chart():
+        builtins.input = scripted_input([chart_choice])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")     # plt.show() sous Agg : rien à afficher
+            chart(state["input_ticker"], state["info"], state["ticker"], state["exchange_rate"], state["my_currency"])
+        plt.gcf().canvas.draw()                 # Rendu effectif de la figure, que plt.show() n'effectue pas sous Agg
+        plt.close("all")
+    stages = {
+        "get_ticker": stage_get_ticker,
+        "convert_currency": stage_convert_currency,
+        "get_qualitative_data": lambda: get_qualitative_data(state["info"]),
+        "get_quantitative_data": lambda: get_quantitative_data(state["ticker"], state["info"], state["ticker_currency"],
+                                                               state["my_currency"], state["exchange_rate"]),
+        "results_display": lambda: results_display(state["input_ticker"], state["ticker"], state["info"], state["ticker_currency"],
+                                                   state["my_currency"], state["exchange_rate"]),
+        "chart": stage_chart,
+    }
+    saved_input = builtins.input
+    try:
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            for stage in REPLAY_STAGES:
+                measure(stage, stages[stage])
+    finally:
+        builtins.input = saved_input
+
+
+# Exécuter "function" avec des dépendances de rejeu : actifs, téléchargements et cache temporaire désactivé (limiteur levé hors réseau seulement)
+def with_replay_sources(make_ticker, function, unthrottled=False):
+    global ticker_factory, cache_dir, cache_enabled
+    saved = ticker_factory, cache_dir, cache_enabled, dict(rate_limit), dict(limiter_state)
+    ticker_factory = make_ticker
+    cache_dir, cache_enabled = tempfile.mkdtemp(prefix="wa_fap_replay_"), False
+    if unthrottled:                             # Rejeu : aucune requête réseau, le limiteur fausserait les mesures
+        rate_limit.update(rate=1e9, max_rate=1e9, burst=1e9)
+        limiter_state["tokens"] = 1e9
+    plt.switch_backend("Agg")
+    try:
+        return function()
+    finally:
+        reset_pipeline_state()                  # Encore sur le dossier temporaire : l'entrepôt de l'utilisateur reste intact
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        ticker_factory, cache_dir, cache_enabled, saved_limit, saved_state = saved
+        rate_limit.update(saved_limit)
+        limiter_state.update(saved_state)
+
+
+# Enregistrer dans un fichier de rejeu les données yahoo!finance utilisées par le parcours complet de chaque actif
+def record_fixtures(tickers, path, my_currency=None, chart_choice="6"):
+    fixtures = {"recorded_at": time.time(), "currency": my_currency, "chart": chart_choice, "benchmark": benchmark_ticker,
+                "tickers": [], "infos": {}, "histories": {}}
+    upstream_ticker = ticker_factory
+    errors = {}
+    def record():
+        for input_ticker in tickers:
+            reset_pipeline_state()
+            try:
+                load_ticker(input_ticker)       # Ticker reconnu, sinon get_ticker() redemanderait une saisie
+                run_pipeline(input_ticker, my_currency, chart_choice)
+                fixtures["tickers"].append(input_ticker)
+            except (Exception, SystemExit) as e:
+                errors[input_ticker] = e
+    with_replay_sources(lambda symbol: RecordingTicker(upstream_ticker(symbol), fixtures), record)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as file:
+        pickle.dump(fixtures, file, protocol=pickle.HIGHEST_PROTOCOL)
+    for input_ticker, error in errors.items():
+        print(f"{RED}{input_ticker} non enregistré : {type(error).__name__} : {error}{RESET}")
+    size = os.path.getsize(path)
+    console.print(f"Fichier de rejeu : {path} ({len(fixtures['tickers'])} actifs, {len(fixtures['infos'])} info, "
+                  f"{len(fixtures['histories'])} historiques, {size / 1024:.1f} Ko)")
+    return errors
+
+
+# Rejouer hors ligne un fichier de rejeu : durées par étape (passes non tracées), puis allocations et pic mémoire (passe tracée)
+def replay_benchmark(path, repeats=5, baseline_path=None, save_baseline=False, tolerance=replay_tolerance):
+    global benchmark_ticker
+    with open(path, "rb") as file:
+        fixtures = pickle.load(file)
+    saved_benchmark, benchmark_ticker = benchmark_ticker, fixtures["benchmark"]
+    timings = {stage: [] for stage in REPLAY_STAGES}
+    memory = {stage: {"net": [], "peak": []} for stage in REPLAY_STAGES}
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        function()
+        timings[stage].append(time.perf_counter() - start)
+
+    def traced(stage, function):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function()
+        current, peak = tracemalloc.get_traced_memory()
+        memory[stage]["net"].append(current - before)
+        memory[stage]["peak"].append(peak - before)
+
+    def replay():
+        for run in range(repeats + 2):          # Une passe de chauffe (importations, polices), puis les passes mesurées, puis la passe tracée
+            measure = None if run == 0 else timed if run <= repeats else traced
+            if measure is traced:
+                tracemalloc.start()
+            for input_ticker in fixtures["tickers"]:
+                reset_pipeline_state()
+                run_pipeline(input_ticker, fixtures["currency"], fixtures["chart"], measure)
+            if measure is traced:
+                memory["total"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+    try:
+        with_replay_sources(lambda symbol: ReplayTicker(symbol, fixtures), replay, unthrottled=True)
+    finally:
+        benchmark_ticker = saved_benchmark
+
+    results = {stage: {"median_ms": float(np.median(timings[stage]) * 1000), "p95_ms": float(np.percentile(timings[stage], 95) * 1000),
+                       "net_kb": float(np.median(memory[stage]["net"]) / 1024), "peak_kb": float(np.max(memory[stage]["peak"]) / 1024)}
+               for stage in REPLAY_STAGES}
+    baseline = {}
+    if baseline_path and os.path.exists(baseline_path) and not save_baseline:
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)["stages"]
+
+    # Régression : médiane ou pic au-delà de la tolérance, et au-delà d'un seuil absolu (bruit de mesure)
+    regressions = []
+    table = Table(title=f"Rejeu hors ligne : {len(fixtures['tickers'])} actifs x {repeats} passes ({os.path.basename(path)})")
+    for column in ["Étape", "Médiane (ms)", "p95 (ms)", "Nettes (Ko)", "Pic (Ko)", "Réf. (ms)", "Écart", "Statut"]:
+        table.add_column(column)
+    for stage, result in results.items():
+        reference = baseline.get(stage)
+        status, change, reference_ms = "-", "-", "-"
+        if reference:
+            ratio = result["median_ms"] / reference["median_ms"] if reference["median_ms"] else 1
+            slower = ratio > 1 + tolerance and result["median_ms"] - reference["median_ms"] > 1
+            heavier = result["peak_kb"] > reference["peak_kb"] * (1 + tolerance) and result["peak_kb"] - reference["peak_kb"] > 64
+            if slower or heavier:
+                regressions.append(stage)
+            status = "[red]régression[/red]" if slower or heavier else "[green]ok[/green]"
+            change, reference_ms = f"{(ratio - 1) * 100:+.1f}%", f"{reference['median_ms']:.2f}"
+        table.add_row(stage, f"{result['median_ms']:.2f}", f"{result['p95_ms']:.2f}", f"{result['net_kb']:.1f}", f"{result['peak_kb']:.1f}",
+                      reference_ms, change, status)
+    console.print(table)
+    console.print(f"Pic d'allocations Python de la passe tracée : {memory['total'] / 1024 ** 2:.2f} Mo")
+
+    if baseline_path and save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as file:
+            json.dump({"fixtures": os.path.basename(path), "tickers": fixtures["tickers"], "repeats": repeats,
+                       "python": sys.version.split()[0], "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                       "stages": results}, file, indent=2)
+        console.print(f"Référence enregistrée : {baseline_path}")
+    elif regressions:
+        print(f"{RED}Régressions (tolérance {tolerance * 100:.0f}%) : {', '.join(regressions)}{RESET}")
+    return regressions
+
+
+
+# Lire la liste des tickers fournis en arguments et/ou dans un fichier (séparés par espaces, virgules ou lignes, "#" pour commenter)
+def read_tickers(symbols=None, path=None):
+    tickers = [symbol.strip().upper() for symbol in symbols or [] if symbol.strip()]
+    if path:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                tickers.extend(line.split("#")[0].replace(",", " ").upper().split())
+    return list(dict.fromkeys(tickers))
+
+
+# Profiler un actif financier sans interaction (exécuté par un fil du pool de travail)
+@instrumented
+def profile_ticker(input_ticker, my_currency=None):
+    ticker, info = load_ticker(input_ticker)
+    ticker_currency = info.get("currency")
+    my_currency = my_currency or ticker_currency
+    exchange_rate = get_exchange_rate(ticker_currency, my_currency)
+    metrics = asset_metrics(ticker, info, ticker_currency, my_currency, exchange_rate)
+    return get_qualitative_data(info), get_quantitative_data(ticker, info, ticker_currency, my_currency, exchange_rate, metrics), metrics
+
+
+# Profiler plusieurs actifs financiers en parallèle via un pool borné, en livrant chaque résultat (ou erreur) dès qu'il est prêt
+def batch_profiles(tickers, my_currency=None, workers=8):
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(profile_ticker, input_ticker, my_currency): input_ticker for input_ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+# Afficher les profils d'une liste d'actifs financiers, les erreurs par ticker et le débit obtenu
+def batch_display(tickers, my_currency=None, workers=8, csv_path=None):
+    console.print(Panel(f"[bold cyan]---> Financial Asset Profile en lot : {len(tickers)} actifs, {workers} fils ({datetime.now().date()})[/bold cyan]", border_style="cyan"))
+    errors, metrics = {}, []
+    start = time.perf_counter()
+    for input_ticker, profile, error in batch_profiles(tickers, my_currency, workers):
+        if error is not None:
+            errors[input_ticker] = error
+            continue
+        qualitative_data, quantitative_data, ticker_metrics = profile
+        metrics.append(ticker_metrics)
+        print_table(f"INFORMATIONS QUALITATITVES POUR {input_ticker}", qualitative_data)
+        print_table(f"INFORMATIONS QUANTITATIVES POUR {input_ticker}", quantitative_data)
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        table_errors = Table(title="Erreurs par ticker", show_header=True)
+        table_errors.add_column("Ticker")
+        table_errors.add_column("Erreur")
+        for input_ticker, error in errors.items():
+            table_errors.add_row(input_ticker, f"{type(error).__name__} : {error}", end_section=True)
+        console.print(table_errors)
+    if csv_path and metrics:
+        pd.concat(metrics).to_csv(csv_path, index=False)
+        console.print(f"Données quantitatives numériques exportées : {csv_path}")
+    console.print(Panel(f"[bold green]{len(tickers) - len(errors)}/{len(tickers)} actifs profilés en {elapsed:.2f} s "
+                        f"({len(tickers) / elapsed if elapsed else 0:.2f} actifs/s)\n{cache_summary()}\n"
+                        f"Change : {fx_stats['pairs']} paires demandées en {fx_stats['lookups']} chargements, {fx_stats['errors']} erreurs\n{warehouse_summary()}\n{limiter_summary()}[/bold green]", border_style="green"))
+    return errors
+
+
+# Mode veille : données fondamentales chargées une fois, puis derniers prix de toute la liste interrogés à intervalle régulier
+
+
+
+# Charger une seule fois les informations (info) d'une liste de tickers via le pool de travail
+def load_watchlist(tickers, workers=8):
+    infos, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(load_ticker, input_ticker): input_ticker for input_ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                infos[futures[future]] = future.result()[1]
+            except Exception as e:
+                errors[futures[future]] = e
+    return {input_ticker: infos[input_ticker] for input_ticker in tickers if input_ticker in infos}, errors
+
+
+# Veille : cotations groupées de yahoo!finance, une seule requête HTTP (et donc un seul jeton du limiteur) par tranche de tickers
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+quote_chunk = 200                           # Tickers par requête de cotations
+
+
+# Interroger en une requête les derniers prix de plusieurs tickers (cookie et crumb gérés par yfinance ; ticker inconnu : absent du résultat)
+def yahoo_quotes(symbols):
+    response = YfData().get_raw_json(QUOTE_URL, params={"symbols": ",".join(symbols), "fields": "regularMarketPrice", "formatted": "false"})
+    return {quote["symbol"]: quote.get("regularMarketPrice") for quote in (response.get("quoteResponse") or {}).get("result") or []}
+
+
+# Cotations fictives hors ligne : une seule latence par requête groupée, prix proche de la clôture fictive, variant chaque minute
+def offline_quotes(symbols, latency=0.2):
+    time.sleep(latency)
+    minute = int(time.time() // 60)
+    quotes = {}
+    for symbol in symbols:
+        seed = OfflineTicker(symbol, 0).seed
+        quotes[symbol] = float(np.random.default_rng(seed).uniform(5, 500) * np.exp(np.random.default_rng([seed, minute]).normal(0, 0.01)))
+    return quotes
+
+
+quote_factory = yahoo_quotes                # Source des cotations groupées (remplaçable par offline_quotes hors ligne)
+
+
+# Interroger les derniers prix d'une liste de tickers par tranches de "quote_chunk" sous le limiteur (sans cache : prix en direct) ;
+# retourne les prix (NaN si indisponible), le nombre réel de requêtes (reprises comprises) et les erreurs par ticker
+def poll_prices(symbols, chunk=quote_chunk):
+    requests = limiter_stats["requests"]
+    quotes, errors = {}, {}
+    for start in range(0, len(symbols), chunk):
+        batch = symbols[start:start + chunk]
+        try:
+            quotes.update(call_upstream(quote_factory, batch, endpoint="quote"))
+        except Exception as e:
+            errors.update(dict.fromkeys(batch, e))
+    prices = pd.to_numeric(pd.Series(quotes, dtype="object"), errors="coerce").astype("float64")
+    return prices.reindex(symbols), limiter_stats["requests"] - requests, errors
+
+
+# Mettre en forme la ligne d'un actif du tableau de veille
+def watch_row(symbol, info, price, rate, my_currency, changed):
+    previous_close = info.get("previousClose")
+    change = (price / previous_close - 1) if previous_close and pd.notna(price) else np.nan
+    color = "green" if change > 0 else "red" if change < 0 else "white"
+    return (symbol, str(info.get("shortName") or "N/A"), f"{price:.2f} {info.get('currency')}" if pd.notna(price) else "N/A",
+            f"{price * rate:.2f} {my_currency}" if pd.notna(price) and pd.notna(rate) else "N/A",
+            f"[{color}]{change * 100:+.2f}%[/{color}]" if pd.notna(change) else "N/A",
+            datetime.now().strftime("%H:%M:%S"), "bold" if changed else "")
+
+
+# Construire le tableau de veille à partir des lignes déjà mises en forme
+def watch_table(rows, status):
+    table = Table(title=f"Veille de {len(rows)} actifs", caption=status)
+    for column in ("Ticker", "Nom", "Prix", "Prix (converti)", "Variation (jour)", "Mise à jour"):
+        table.add_column(column)
+    for row in rows.values():
+        table.add_row(*row[:-1], style=row[-1])
+    return table
+
+
+# Suivre en direct une liste de tickers : seules les lignes dont le prix a changé sont remises en forme à chaque cycle
+def watch_display(tickers, my_currency=None, interval=15.0, cycles=None, workers=8):
+    infos, errors = load_watchlist(tickers, workers)
+    for input_ticker, error in errors.items():
+        console.print(f"[red]{input_ticker} : {type(error).__name__} : {error}[/red]")
+    if not infos:
+        return errors
+    symbols = list(infos)
+    last_prices = pd.Series(np.nan, index=symbols)
+    market_prices = pd.to_numeric(pd.Series({symbol: info.get("regularMarketPrice") for symbol, info in infos.items()}), errors="coerce")
+    rows = {symbol: watch_row(symbol, info, np.nan, np.nan, my_currency or info.get("currency"), False) for symbol, info in infos.items()}
+    cycle = 0
+    with Live(watch_table(rows, "Chargement des prix..."), console=console, auto_refresh=False) as live:
+        try:
+            while cycles is None or cycle < cycles:
+                start = time.perf_counter()
+                prices, requests, poll_errors = poll_prices(symbols)
+                prices = prices.fillna(market_prices)   # Sans cotation (ex. : tranche en erreur) : dernier prix connu de yahoo!finance
+                if my_currency:
+                    load_exchange_rates({info.get("currency") for info in infos.values()}, my_currency)
+                changed = ~np.isclose(prices.to_numpy(), last_prices.to_numpy(), equal_nan=True)
+                for symbol in prices.index[changed]:
+                    info = infos[symbol]
+                    currency = my_currency or info.get("currency")
+                    rate = (exchange_rate_status(info.get("currency"), currency) or {}).get("rate", np.nan)
+                    rows[symbol] = watch_row(symbol, info, prices[symbol], rate, currency, cycle > 0)
+                for symbol in last_prices.index[~changed]:      # Lignes inchangées : retirer la mise en évidence
+                    rows[symbol] = rows[symbol][:-1] + ("",)
+                last_prices = prices
+                cycle += 1
+                latency = time.perf_counter() - start
+                live.update(watch_table(rows, f"Cycle {cycle} : {requests} requêtes, {len(poll_errors)} erreurs, {int(changed.sum())} lignes modifiées, "
+                                              f"rafraîchi en {latency * 1000:.0f} ms (Ctrl+C pour quitter)"), refresh=True)
+                if cycles is None or cycle < cycles:
+                    count("fap_sleep_seconds_total", max(0.0, interval - latency), reason="watch_interval")
+                    time.sleep(max(0.0, interval - latency))
+        except KeyboardInterrupt:
+            pass
+    return errors
+
+
+
+# Filtre d'univers : instantané local des données fondamentales de milliers d'actifs, avec index triés (ratios) et bitmaps (catégories)
+SCREEN_CATEGORIES = ["sector", "industry", "exchange", "currency", "quoteType", "country"]
+SCREEN_NUMERIC = [*INFO_NUMERIC, "currentPrice", "sustainableGrowthRate", "marketCapUSD", "enterpriseValueUSD"]
+universe_max_age = 24 * 3600                # Âge (s) au-delà duquel les données d'un actif sont de nouveau téléchargées
+universe_flush = 1000                       # Actifs téléchargés entre deux écritures de l'instantané (reprise après interruption)
+universe_index = {}                         # Index chargé en mémoire (rechargé si le fichier change)
+universe_lock = threading.Lock()
+
+
+
+# Chemin de l'instantané (Arrow si pyarrow est installé, sinon pickle)
+def universe_path():
+    return os.path.join(cache_dir, "universe.arrow" if pa is not None else "universe.pkl")
+
+
+# Lire l'instantané (None si absent ou illisible)
+def read_universe(path=None):
+    path = path or universe_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        if pa is None:
+            return pd.read_pickle(path)
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all().to_pandas()
+    except (OSError, ValueError, pickle.UnpicklingError):
+        return None
+
+
+# Écrire l'instantané avec ses index triés précalculés (ordre croissant des lignes par ratio, NaN en dernier), puis remplacement atomique
+def write_universe(frame, path=None):
+    path = path or universe_path()
+    frame = frame[[column for column in frame.columns if not column.startswith("order_")]].reset_index(drop=True)
+    for field in SCREEN_CATEGORIES:
+        frame[field] = frame[field].astype("category")
+    orders = {f"order_{field}": np.argsort(frame[field].to_numpy(dtype="float64"), kind="stable").astype(np.int32) for field in SCREEN_NUMERIC}
+    frame = pd.concat([frame, pd.DataFrame(orders)], axis=1)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if pa is None:
+        frame.to_pickle(f"{path}.tmp")
+    else:
+        table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata({"written_at": str(time.time())})
+        with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    try:
+        os.replace(f"{path}.tmp", path)
+    except OSError:                             # Fichier encore projeté en mémoire (Windows) : conserver l'ancien instantané
+        os.remove(f"{path}.tmp")
+    return frame
+
+
+# Construire les lignes de l'instantané à partir des dictionnaires info (ratios calculés en une passe, montants aussi convertis en USD)
+def universe_rows(infos, fetched_at):
+    records = list(infos.values())
+    metrics = compute_metrics(records, "USD")
+    rows = pd.DataFrame({"symbol": list(infos)})
+    for field in [*SCREEN_CATEGORIES, "longName"]:
+        rows[field] = pd.Series([info.get(field) for info in records], dtype="string")
+    for field in [*INFO_NUMERIC, "currentPrice", "sustainableGrowthRate"]:
+        rows[field] = metrics[field].to_numpy()
+    rows["marketCapUSD"] = metrics["marketCapConverted"].to_numpy()
+    rows["enterpriseValueUSD"] = metrics["enterpriseValueConverted"].to_numpy()
+    rows["valid"] = ["shortName" in info for info in records]
+    rows["fetched_at"] = fetched_at
+    return rows
+
+
+# Fusionner de nouvelles lignes dans l'instantané (remplacement des actifs déjà présents)
+def merge_universe(frame, rows):
+    if frame is None or frame.empty:
+        return rows
+    frame = frame.loc[~frame["symbol"].isin(rows["symbol"]), rows.columns].astype(dict.fromkeys(SCREEN_CATEGORIES, "string"))
+    return pd.concat([frame, rows], ignore_index=True)
+
+
+# Mettre à jour l'instantané : seuls les actifs absents ou dont les données ont plus de "max_age" secondes sont téléchargés
+def refresh_universe(tickers, max_age=universe_max_age, workers=8, force=False):
+    frame = read_universe()
+    fetched = frame.set_index("symbol")["fetched_at"] if frame is not None else pd.Series(dtype="float64")
+    now = time.time()
+    stale = [symbol for symbol in tickers if force or now - fetched.get(symbol, 0) > max_age]
+    console.print(f"Instantané : {0 if frame is None else len(frame)} actifs ; {len(stale)}/{len(tickers)} à télécharger")
+    infos, errors, done = {}, {}, 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(call_upstream, lambda symbol=symbol: ticker_factory(symbol).info, endpoint="info"): symbol for symbol in stale}
+        for future in as_completed(futures):
+            try:
+                infos[futures[future]] = future.result()
+            except Exception as e:
+                errors[futures[future]] = e
+            if len(infos) >= universe_flush:
+                frame = write_universe(merge_universe(frame, universe_rows(infos, time.time())))
+                done += len(infos)
+                infos = {}
+                console.print(f"  {done}/{len(stale)} actifs enregistrés ({time.perf_counter() - start:.1f} s)")
+    if infos or frame is None:
+        frame = write_universe(merge_universe(frame, universe_rows(infos, time.time())))
+        done += len(infos)
+    for symbol, error in list(errors.items())[:20]:
+        print(f"{RED}{symbol} : {type(error).__name__} : {error}{RESET}")
+    console.print(Panel(f"[bold green]{done} actifs mis à jour en {time.perf_counter() - start:.2f} s, {len(errors)} erreurs ; "
+                        f"instantané : {len(frame)} actifs ({int(frame['valid'].sum())} reconnus), {universe_path()}\n{limiter_summary()}[/bold green]",
+                        border_style="green"))
+    return errors
+
+
+# Charger l'instantané et ses index en mémoire, une seule fois tant que le fichier ne change pas
+def load_universe_index():
+    path = universe_path()
+    if not os.path.exists(path):
+        raise ValueError(f"Aucun instantané n'a été trouvé ({path}). Lancez d'abord la commande universe.")
+    with universe_lock:
+        if universe_index.get("path") == path and universe_index.get("mtime") == os.stat(path).st_mtime_ns:
+            return universe_index
+        frame = read_universe(path)
+        if frame is None:
+            raise ValueError(f"L'instantané est illisible ({path}). Relancez la commande universe.")
+        universe_index.clear()
+        universe_index.update(path=path, mtime=os.stat(path).st_mtime_ns, frame=frame, size=len(frame),
+                              valid=frame["valid"].to_numpy(dtype=bool), bitmaps={}, sorted={})
+        return universe_index
+
+
+# Bitmap d'une catégorie : lignes dont le champ vaut l'une des valeurs demandées (sans tenir compte de la casse), mémorisé par valeur
+def category_bitmap(index, field, values):
+    column = index["frame"][field]
+    codes = {str(category).lower(): code for code, category in enumerate(column.cat.categories)}
+    mask = np.zeros(index["size"], dtype=bool)
+    for value in values:
+        code = codes.get(value.lower())
+        if code is None:
+            continue
+        key = (field, code)
+        if key not in index["bitmaps"]:
+            index["bitmaps"][key] = column.cat.codes.to_numpy() == code
+        mask |= index["bitmaps"][key]
+    return mask
+
+
+# Index trié d'un ratio : (valeurs croissantes sans NaN, positions des lignes correspondantes), mémorisé
+def sorted_index(index, field):
+    if field not in index["sorted"]:
+        values = index["frame"][field].to_numpy(dtype="float64")
+        order = index["frame"][f"order_{field}"].to_numpy()
+        known = int(np.count_nonzero(~np.isnan(values)))
+        index["sorted"][field] = (values[order[:known]], order[:known])
+    return index["sorted"][field]
+
+
+# Bitmap d'une condition sur un ratio, par recherche dichotomique dans l'index trié
+def range_bitmap(index, field, operator, bound):
+    values, order = sorted_index(index, field)
+    left, right = np.searchsorted(values, bound, "left"), np.searchsorted(values, bound, "right")
+    positions = {"<": order[:left], "<=": order[:right], ">": order[right:], ">=": order[left:], "=": order[left:right]}[operator]
+    mask = np.zeros(index["size"], dtype=bool)
+    mask[positions] = True
+    return mask
+
+
+# Retrouver le nom exact d'un ratio de l'instantané (sans tenir compte de la casse)
+def screen_field(name):
+    fields = {field.lower(): field for field in SCREEN_NUMERIC}
+    if name.lower() not in fields:
+        raise ValueError(f"Ratio inconnu : {name} (choix : {', '.join(SCREEN_NUMERIC)}).")
+    return fields[name.lower()]
+
+
+# Lire une condition "ratio<valeur" (opérateurs <, <=, >, >=, = ; suffixe % pour un pourcentage, ex. : sustainableGrowthRate>8%)
+def parse_condition(text):
+    match = re.fullmatch(r"\s*(\w+)\s*(<=|>=|<|>|=)\s*(-?[\d.]+(?:e-?\d+)?)\s*(%?)\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Condition invalide : {text} (ex. : trailingPE<15, sustainableGrowthRate>8%).")
+    field, operator, value, percent = match.groups()
+    return screen_field(field), operator, float(value) / (100 if percent else 1)
+
+
+# Filtrer et classer l'univers sans appel réseau : bitmaps des catégories ET conditions sur les ratios, puis parcours de l'index trié du classement
+def screen_universe(categories=None, conditions=(), sort=None, descending=False, limit=25):
+    index = load_universe_index()
+    mask = index["valid"].copy()
+    for field, values in (categories or {}).items():
+        if values:
+            mask &= category_bitmap(index, field, values)
+    for condition in conditions:
+        mask &= range_bitmap(index, *parse_condition(condition))
+    if sort:
+        order = sorted_index(index, screen_field(sort))[1]
+        order = order[::-1] if descending else order
+        ranked = order[mask[order]]
+    else:
+        ranked = np.flatnonzero(mask)
+    return index["frame"].iloc[ranked[:limit]], int(np.count_nonzero(mask)), index["size"]
+
+
+# Afficher les actifs retenus par le filtre d'univers et la durée de la requête
+def screen_display(categories=None, conditions=(), sort=None, descending=False, limit=25, csv_path=None):
+    start = time.perf_counter()
+    load_universe_index()
+    loaded = time.perf_counter()
+    result, matched, size = screen_universe(categories, conditions, sort, descending, limit)
+    elapsed = time.perf_counter() - loaded
+    fields = list(dict.fromkeys([parse_condition(condition)[0] for condition in conditions] + ([screen_field(sort)] if sort else [])))
+    table = Table(title=f"Filtre d'univers : {matched} actifs retenus sur {size} (requête : {elapsed * 1000:.2f} ms ; "
+                        f"chargement de l'instantané : {(loaded - start) * 1000:.1f} ms)", show_header=True)
+    for column in ["Ticker", "Nom", "Secteur", "Industrie", "Place", "Monnaie", *fields]:
+        table.add_column(column)
+    for _, row in result.iterrows():
+        table.add_row(row["symbol"], *[str(row[field]) if pd.notna(row[field]) else "N/A" for field in ["longName", "sector", "industry", "exchange", "currency"]],
+                      *[f"{row[field]:.4g}" if pd.notna(row[field]) else "N/A" for field in fields])
+    console.print(table)
+    if csv_path:
+        result.drop(columns=[column for column in result.columns if column.startswith("order_")]).to_csv(csv_path, index=False)
+        console.print(f"Actifs retenus exportés : {csv_path}")
+    return result
+
+
+
+# Service HTTP local : profils et séries des graphiques en JSON, partagés par plusieurs utilisateurs via un seul cache
+server_host, server_port = "127.0.0.1", 8765
+ANSI_CODES = re.compile(r"\033\[[\d;]*m")
+
+
+# Convertir une valeur (numpy, pandas, NaN) en valeur JSON
+def json_value(value):
+    if isinstance(value, str):
+        return ANSI_CODES.sub("", value)
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+# Construire le profil JSON d'un actif (données qualitatives, quantitatives mises en forme et numériques)
+def profile_json(input_ticker, my_currency=None):
+    qualitative_data, quantitative_data, metrics = profile_ticker(input_ticker, my_currency)
+    return {"ticker": input_ticker,
+            "qualitative": {key: json_value(value) for key, value in qualitative_data.items()},
+            "quantitative": {key: json_value(value) for key, value in quantitative_data.items()},
+            "metrics": {key: json_value(value) for key, value in metrics.iloc[0].items()}}
+
+
+# Construire la série JSON d'une période de graphique (prix convertis et perte depuis le plus haut, sous-échantillonnés)
+def history_json(input_ticker, period, my_currency=None, points=chart_size[0] * 100):
+    if period not in CHART_PERIODS.values():
+        raise ValueError(f"Période invalide : {period} (choix : {', '.join(CHART_PERIODS.values())}).")
+    if points < 1:
+        raise ValueError(f"Nombre de points invalide : {points} (au moins 1).")
+    ticker, info = load_ticker(input_ticker)
+    my_currency = my_currency or info.get("currency")
+    exchange_rate = get_exchange_rate(info.get("currency"), my_currency)
+    period_data = period_history(ticker, period, info.get("exchangeTimezoneName"))
+    if period_data.empty:
+        raise LookupError(f"Aucune donnée n'est disponible pour {input_ticker} sur {period}.")
+    data = chart_data(period_data, exchange_rate, points)
+    def dates(x):
+        return np.datetime_as_string((x * 86_400e9).astype("datetime64[ns]"), unit="s").tolist()
+    (x, y), (drawdown_x, drawdown) = data["price"], data["drawdown"]
+    return {"ticker": input_ticker, "period": period, "currency": my_currency, "exchangeRate": exchange_rate, "points": data["points"],
+            "price": {"dates": dates(x), "values": y.tolist()}, "drawdown": {"dates": dates(drawdown_x), "values": drawdown.tolist()}}
+
+
+# Filtrer et classer l'univers pour le service (paramètres répétables : sector, industry, exchange, currency, quoteType, country, where)
+def screen_json(params):
+    categories = {field: params.get(field) for field in SCREEN_CATEGORIES}
+    sort, limit = params.get("sort", [None])[-1], int(params.get("limit", [25])[-1])
+    result, matched, size = screen_universe(categories, params.get("where", []), sort, params.get("desc", ["0"])[-1] in ("1", "true"), limit)
+    columns = ["symbol", "longName", *SCREEN_CATEGORIES, *SCREEN_NUMERIC]
+    return {"matched": matched, "universe": size,
+            "results": [{column: json_value(value) for column, value in zip(columns, row)} for row in result[columns].itertuples(index=False)]}
+
+
+# Valider les paramètres d'une requête avant tout chargement (message de l'erreur à renvoyer en 400, sinon None)
+def request_error(parts, params):
+    query = {key: values[-1] for key, values in params.items()}
+    if len(parts) == 3 and parts[0] == "history" and parts[2] not in CHART_PERIODS.values():
+        return f"Période invalide : {parts[2]} (choix : {', '.join(CHART_PERIODS.values())})."
+    if query.get("currency") and not re.fullmatch(r"[A-Za-z]{3}", query["currency"]):
+        return f"Monnaie invalide : {query['currency']} (code ISO à 3 lettres attendu, ex. : EUR)."
+    for name in ("points", "limit"):
+        if name in query and not (query[name].isdigit() and int(query[name]) >= 1):
+            return f"Paramètre {name} invalide : {query[name]} (entier supérieur ou égal à 1 attendu)."
+    if parts == ["screen"]:
+        try:
+            for condition in params.get("where", []):
+                parse_condition(condition)
+            if query.get("sort"):
+                screen_field(query["sort"])
+        except ValueError as e:
+            return str(e)
+    return None
+
+
+# Rassembler les compteurs du service (cache, limiteur, regroupement, change, entrepôt)
+def server_stats():
+    return {"cache": cache_stats, "limiter": limiter_stats, "coalescing": inflight_stats, "fx": fx_stats, "warehouse": warehouse_stats,
+            "history_store": len(history_store), "telemetry": telemetry_snapshot()}
+
+
+# Traiter les requêtes : GET /profile/<ticker>, /history/<ticker>/<période>, /screen, /stats, /metrics (paramètres : currency, points, filtres)
+class ProfileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        params = parse_qs(url.query)
+        query = {key: values[-1] for key, values in params.items()}
+        my_currency = query["currency"].upper() if query.get("currency") else None
+        route = parts[0] if parts[0] in ("profile", "history", "screen", "stats", "metrics") else "unknown"
+        error = request_error(parts, params)
+        try:
+            if error:
+                self.send_json(400, {"error": error})
+            elif parts == ["metrics"]:
+                self.send_body(200, telemetry_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            elif parts == ["stats"]:
+                self.send_json(200, server_stats())
+            elif parts == ["screen"]:
+                self.send_json(200, screen_json(params))
+            elif len(parts) == 2 and parts[0] == "profile":
+                self.send_json(200, profile_json(parts[1].upper(), my_currency))
+            elif len(parts) == 3 and parts[0] == "history":
+                self.send_json(200, history_json(parts[1].upper(), parts[2], my_currency, int(query.get("points", chart_size[0] * 100))))
+            else:
+                self.send_json(404, {"error": f"Ressource inconnue : {url.path}"})
+        except LookupError as e:                # Ticker inconnu ou sans données
+            self.send_json(404, {"error": str(e)})
+        except ValueError as e:                 # Paramètre refusé après chargement (ex. : monnaie inconnue)
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:                  # Erreur de yahoo!finance, taux de change indisponible compris
+            self.send_json(502, {"error": f"Erreur lors de la correspondance dans yahoo!finance : {type(e).__name__} : {e}"})
+        observe("fap_http_seconds", time.perf_counter() - start, route=route)
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        count("fap_http_responses_total", status=str(status))
+        count("fap_http_bytes_total", len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Créer le serveur (un fil par connexion) ; port 0 : port libre choisi par le système
+def make_server(host=server_host, port=server_port):
+    server = ThreadingHTTPServer((host, port), ProfileHandler)
+    server.daemon_threads = True
+    return server
+
+
+# Lancer le service jusqu'à l'interruption (Ctrl+C)
+def serve(host=server_host, port=server_port):
+    server = make_server(host, port)
+    console.print(Panel(f"[bold cyan]---> Financial Asset Profile en service sur http://{host}:{server.server_port} "
+                        f"(/profile/<ticker>, /history/<ticker>/<période>, /screen, /stats, /metrics)[/bold cyan]", border_style="cyan"))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        console.print(f"{cache_summary()}\nRegroupement : {inflight_stats['followers']} requêtes servies par un chargement déjà en cours\n{limiter_summary()}")
+    return 0
+
+
+# Test de charge : N clients simultanés contre le service, yahoo!finance remplacé par des actifs fictifs (popularité de Zipf)
+def server_benchmark(clients=32, requests_per_client=20, symbols=20, seed=7):
+    server = make_server("127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    universe = [f"SYM{i:03d}" for i in range(symbols)]
+    weights = 1 / np.arange(1, symbols + 1)
+    periods = list(CHART_PERIODS.values())
+    rng = random.Random(seed)
+    paths = [[f"/profile/{symbol}" if rng.random() < 0.7 else f"/history/{symbol}/{rng.choice(periods)}"
+              for symbol in rng.choices(universe, weights, k=requests_per_client)] for _ in range(clients)]
+
+    def client(client_paths):
+        timings = []
+        for path in client_paths:
+            start = time.perf_counter()
+            try:
+                with urlopen(base_url + path, timeout=120) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            timings.append((path.split("/")[1], status, time.perf_counter() - start))
+        return timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = [timing for timings in pool.map(client, paths) for timing in timings]
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    table = Table(title=f"Test de charge : {clients} clients x {requests_per_client} requêtes, {symbols} actifs", show_header=True)
+    for column in ["Ressource", "Requêtes", "Erreurs", "p50 (ms)", "p99 (ms)", "Max (ms)"]:
+        table.add_column(column)
+    for resource in ["profile", "history", "toutes"]:
+        rows = [row for row in results if resource == "toutes" or row[0] == resource]
+        if not rows:
+            continue
+        latencies = np.array([row[2] for row in rows]) * 1000
+        table.add_row(resource, str(len(rows)), str(sum(row[1] != 200 for row in rows)), f"{np.percentile(latencies, 50):.1f}",
+                      f"{np.percentile(latencies, 99):.1f}", f"{latencies.max():.1f}")
+    console.print(table)
+    console.print(Panel(f"[bold green]{len(results)} requêtes en {elapsed:.2f} s ({len(results) / elapsed:.1f} requêtes/s)\n"
+                        f"Appels à yahoo!finance : {limiter_stats['requests']} ; regroupement : {inflight_stats['followers']} requêtes "
+                        f"servies par un chargement déjà en cours ({'activé' if coalescing_enabled else 'désactivé'})\n"
+                        f"{cache_summary()}[/bold green]", border_style="green"))
+    return results
+
+
+
+# Lire les arguments de la ligne de commande (sans sous-commande : mode interactif)
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(prog="wa_fap.py", description="Financial Asset Profile (FinAP) - profils d'actifs financiers via yahoo!finance")
+    parser.add_argument("--cache-dir", default=cache_dir, help=f"Dossier du cache local (défaut : {cache_dir})")
+    parser.add_argument("--cache-size", type=float, default=cache_budget / 1024 ** 2, help="Budget disque du cache en Mo (défaut : 256)")
+    parser.add_argument("--no-cache", action="store_true", help="Désactiver le cache local (entrepôt d'historiques compris)")
+    parser.add_argument("--rps", type=float, default=rate_limit["max_rate"], help="Requêtes par seconde vers yahoo!finance (défaut : 2)")
+    parser.add_argument("--burst", type=int, default=rate_limit["burst"], help="Rafale maximale de requêtes (défaut : 5)")
+    parser.add_argument("--benchmark", default=benchmark_ticker, help=f"Indice de référence du bêta (défaut : {benchmark_ticker})")
+    parser.add_argument("--memory-budget", type=float, default=analytics_budget / 1024 ** 2, help="Budget mémoire des analyses de risque en Mo (défaut : 512)")
+    parser.add_argument("--metrics", help="Écrire l'instrumentation en fin d'exécution dans ce fichier (\"-\" : sortie standard)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], help="Format de l'instrumentation (défaut : json si le fichier finit par .json, sinon prometheus)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # Options communes : source hors ligne, puis liste de tickers
+    source = argparse.ArgumentParser(add_help=False)
+    source.add_argument("--offline", action="store_true", help="Remplacer yahoo!finance par des actifs fictifs (mesure du débit)")
+    source.add_argument("--latency", type=float, default=0.2, help="Latence simulée par requête hors ligne, en secondes (défaut : 0.2)")
+    watchlist = argparse.ArgumentParser(add_help=False, parents=[source])
+    watchlist.add_argument("tickers", nargs="*", help="Tickers (ex. : CNR.TO AAPL)")
+    watchlist.add_argument("-f", "--file", help="Fichier de tickers (un ou plusieurs par ligne)")
+
+    batch = subparsers.add_parser("batch", parents=[watchlist], help="Profiler une liste de tickers sans interaction")
+    batch.add_argument("-c", "--currency", help="Monnaie locale en ISO Code (par défaut : celle de chaque actif)")
+    batch.add_argument("-w", "--workers", type=int, default=8, help="Nombre de requêtes simultanées (défaut : 8)")
+    batch.add_argument("--csv", help="Exporter les données quantitatives numériques de tous les actifs dans un fichier CSV")
+
+    risk = subparsers.add_parser("risk", parents=[watchlist], help="Calculer les indicateurs de risque et corrélations d'une liste de tickers")
+    risk.add_argument("-p", "--period", default="1y", choices=["1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "max"], help="Période d'analyse (défaut : 1y)")
+    risk.add_argument("--window", type=int, default=63, help="Fenêtre du bêta glissant, en jours de bourse (défaut : 63)")
+    risk.add_argument("-w", "--workers", type=int, default=8, help="Nombre de requêtes simultanées (défaut : 8)")
+    risk.add_argument("--correlation", help="Exporter la matrice de corrélation des rendements dans un fichier CSV")
+
+    render = subparsers.add_parser("render", parents=[watchlist], help="Générer sans affichage les graphiques d'une liste de tickers (PNG/SVG)")
+    render.add_argument("-p", "--periods", nargs="+", default=list(CHART_PERIODS.values()), choices=list(CHART_PERIODS.values()), help="Périodes (défaut : toutes)")
+    render.add_argument("-c", "--currency", help="Monnaie locale en ISO Code (par défaut : celle de chaque actif)")
+    render.add_argument("-o", "--output", default="charts", help="Dossier des graphiques (défaut : charts)")
+    render.add_argument("--format", default="png", choices=["png", "svg"], help="Format des graphiques (défaut : png)")
+    render.add_argument("-w", "--workers", type=int, default=8, help="Nombre de requêtes simultanées (défaut : 8)")
+    render.add_argument("--processes", type=int, default=1, help="Nombre de processus de rendu (défaut : 1)")
+
+    watch = subparsers.add_parser("watch", parents=[watchlist], help="Suivre en direct les prix d'une liste de tickers")
+    watch.add_argument("-c", "--currency", help="Monnaie locale en ISO Code (par défaut : celle de chaque actif)")
+    watch.add_argument("-i", "--interval", type=float, default=15.0, help="Intervalle entre deux rafraîchissements, en secondes (défaut : 15)")
+    watch.add_argument("--cycles", type=int, help="Nombre de rafraîchissements avant de quitter (défaut : illimité)")
+    watch.add_argument("-w", "--workers", type=int, default=8, help="Nombre de requêtes simultanées au chargement des données fondamentales (défaut : 8)")
+
+    universe = subparsers.add_parser("universe", parents=[watchlist], help="Mettre à jour l'instantané des données fondamentales d'un univers de tickers")
+    universe.add_argument("--max-age", type=float, default=universe_max_age / 3600, help="Âge en heures au-delà duquel un actif est de nouveau téléchargé (défaut : 24)")
+    universe.add_argument("--force", action="store_true", help="Télécharger de nouveau tous les actifs")
+    universe.add_argument("-w", "--workers", type=int, default=8, help="Nombre de requêtes simultanées (défaut : 8)")
+
+    screen = subparsers.add_parser("screen", parents=[source], help="Filtrer et classer l'univers enregistré, sans appel réseau")
+    for field in SCREEN_CATEGORIES:
+        screen.add_argument(f"--{field.lower()}", dest=field, nargs="+", help=f"Valeurs acceptées pour {field} (l'une ou l'autre)")
+    screen.add_argument("--where", nargs="+", default=[], help="Conditions sur les ratios (ex. : \"trailingPE<15\" \"pegRatio<1\" \"sustainableGrowthRate>8%%\")")
+    screen.add_argument("-s", "--sort", help="Ratio de classement (ex. : marketCapUSD)")
+    screen.add_argument("--desc", action="store_true", help="Classer par ordre décroissant")
+    screen.add_argument("-n", "--limit", type=int, default=25, help="Nombre d'actifs affichés (défaut : 25)")
+    screen.add_argument("--csv", help="Exporter les actifs retenus dans un fichier CSV")
+
+    server = subparsers.add_parser("serve", parents=[source], help="Servir les profils et séries des graphiques en JSON sur HTTP")
+    server.add_argument("--host", default=server_host, help=f"Adresse d'écoute (défaut : {server_host})")
+    server.add_argument("--port", type=int, default=server_port, help=f"Port d'écoute (défaut : {server_port})")
+
+    bench_server = subparsers.add_parser("bench-server", help="Mesurer le service sous charge, avec des actifs fictifs")
+    bench_server.add_argument("--clients", type=int, default=32, help="Nombre de clients simultanés (défaut : 32)")
+    bench_server.add_argument("--requests", type=int, default=20, help="Requêtes par client (défaut : 20)")
+    bench_server.add_argument("--symbols", type=int, default=20, help="Nombre d'actifs fictifs demandés (défaut : 20)")
+    bench_server.add_argument("--latency", type=float, default=0.2, help="Latence simulée par requête, en secondes (défaut : 0.2)")
+    bench_server.add_argument("--no-coalesce", action="store_true", help="Désactiver le regroupement des requêtes simultanées (comparaison)")
+
+    record = subparsers.add_parser("record", parents=[watchlist], help="Enregistrer les données yahoo!finance d'une liste de tickers pour le rejeu")
+    record.add_argument("-o", "--output", default=os.path.join("fixtures", "replay.pkl"), help="Fichier de rejeu (défaut : fixtures/replay.pkl)")
+    record.add_argument("-c", "--currency", help="Monnaie locale en ISO Code (par défaut : celle de chaque actif)")
+    record.add_argument("--chart", default="6", choices=list(CHART_PERIODS), help="Période du graphique rejoué, choix 1 à 9 du mode interactif (défaut : 6, 1 an)")
+
+    replay = subparsers.add_parser("replay", help="Rejouer hors ligne un fichier de rejeu et mesurer chaque étape du parcours")
+    replay.add_argument("fixtures", nargs="?", default=os.path.join("fixtures", "replay.pkl"), help="Fichier de rejeu (défaut : fixtures/replay.pkl)")
+    replay.add_argument("-r", "--repeats", type=int, default=5, help="Nombre de passes mesurées (défaut : 5)")
+    replay.add_argument("-b", "--baseline", help="Fichier JSON de référence auquel comparer les mesures")
+    replay.add_argument("--save-baseline", action="store_true", help="Enregistrer les mesures comme nouvelle référence")
+    replay.add_argument("--tolerance", type=float, default=replay_tolerance * 100, help="Écart toléré en %% avant de signaler une régression (défaut : 25)")
+
+    bench_history = subparsers.add_parser("bench-history", parents=[watchlist], help="Mesurer les latences de l'entrepôt d'historiques")
+    bench_history.add_argument("--intraday", action="store_true", help="Mesurer les barres de 30 minutes plutôt que journalières")
+
+    cache = subparsers.add_parser("cache", help="Gérer le cache local")
+    cache.add_argument("--clear", action="store_true", help="Vider le cache")
+
+    return parser.parse_args(argv)
+
+
+# Lancer le mode demandé par la ligne de commande, puis écrire l'instrumentation si demandé (même après une erreur ou Ctrl+C)
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        return run_command(args)
+    finally:
+        if args.metrics:
+            write_telemetry(args.metrics, args.metrics_format)
+
+
+# Exécuter la sous-commande (sans sous-commande : mode interactif)
+def run_command(args):
+    global ticker_factory, quote_factory, cache_dir, cache_budget, cache_enabled, benchmark_ticker, analytics_budget, coalescing_enabled
+    benchmark_ticker, analytics_budget = args.benchmark.upper(), int(args.memory_budget * 1024 ** 2)
+    cache_dir, cache_budget, cache_enabled = args.cache_dir, int(args.cache_size * 1024 ** 2), not args.no_cache
+    rate_limit.update(rate=args.rps, max_rate=args.rps, min_rate=min(rate_limit["min_rate"], args.rps), burst=max(1, args.burst))
+    limiter_state["tokens"] = rate_limit["burst"]
+    if args.command == "cache":
+        entries, size = cache_clear() if args.clear else cache_connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        print(f"{'Entrées supprimées' if args.clear else 'Entrées'} : {entries} ({size / 1024 ** 2:.2f} Mo, {cache_dir})")
+        return 0
+    if args.command is None:
+        final_display()
+        return 0
+
+    if args.command == "bench-server" or getattr(args, "offline", False):
+        ticker_factory = lambda symbol: OfflineTicker(symbol, args.latency)
+        quote_factory = lambda symbols: offline_quotes(symbols, args.latency)
+        cache_dir = os.path.join(cache_dir, "offline")
+    if args.command == "bench-server":
+        coalescing_enabled = not args.no_coalesce
+        with tempfile.TemporaryDirectory() as cache_dir:          # Cache vide : chaque actif est chargé au moins une fois
+            results = server_benchmark(args.clients, args.requests, args.symbols)
+        return 0 if all(status == 200 for _, status, _ in results) else 1
+    if args.command == "serve":
+        return serve(args.host, args.port)
+    if args.command == "screen":
+        try:
+            screen_display({field: getattr(args, field) for field in SCREEN_CATEGORIES}, args.where, args.sort, args.desc, args.limit, args.csv)
+        except ValueError as e:
+            print(f"{RED}{e}{RESET}")
+            return 1
+        return 0
+    if args.command == "replay":
+        if not os.path.exists(args.fixtures):
+            print(f"{RED}Fichier de rejeu introuvable : {args.fixtures} (voir la commande record).{RESET}")
+            return 1
+        regressions = replay_benchmark(args.fixtures, max(1, args.repeats), args.baseline, args.save_baseline, args.tolerance / 100)
+        return 1 if regressions else 0
+
+    tickers = read_tickers(args.tickers, args.file)
+    if not tickers:
+        print(f"{RED}Aucun ticker n'a été fourni.{RESET}")
+        return 1
+    if args.command == "batch":
+        errors = batch_display(tickers, args.currency.upper() if args.currency else None, args.workers, args.csv)
+        return 1 if errors else 0
+    if args.command == "risk":
+        errors = risk_display(tickers, args.period, args.window, args.workers, args.correlation)
+        return 1 if errors else 0
+    if args.command == "render":
+        errors = render_display(tickers, args.periods, args.currency.upper() if args.currency else None, args.output, args.format, args.workers, args.processes)
+        return 1 if errors else 0
+    if args.command == "watch":
+        errors = watch_display(tickers, args.currency.upper() if args.currency else None, args.interval, args.cycles, args.workers)
+        return 1 if errors else 0
+    if args.command == "universe":
+        errors = refresh_universe(tickers, args.max_age * 3600, args.workers, args.force)
+        return 1 if errors else 0
+    if args.command == "record":
+        errors = record_fixtures(tickers, args.output, args.currency.upper() if args.currency else None, args.chart)
+        return 1 if errors else 0
+    if args.command == "bench-history":
+        return 0 if warehouse_benchmark(tickers, "intraday" if args.intraday else "daily") else 1
+    return 0
+
+
 # Restreindre l'exécution de ce code au lancement de ce fichier uniquement
 if __name__ == "__main__":
-    final_display()
+    raise SystemExit(main())
 
 
 